@@ -0,0 +1,54 @@
+from decimal import Decimal
+import orjson
+from django.contrib.gis.geos import GEOSGeometry, Point
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# NumPy arrays/scalars and non-string dict keys are encoded like the stdlib encoder would
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+_fallback = JSONEncoder()
+
+
+def default(obj):
+    """
+    Types orjson does not encode itself. Anything else falls back to DRF's
+    JSONEncoder, so lazy strings, querysets, timedeltas etc. behave as before.
+    """
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Point):
+        return {"type": "Point", "coordinates": obj.coords}
+    if isinstance(obj, GEOSGeometry):
+        return orjson.loads(obj.json)
+    return _fallback.default(obj)
+
+
+def dumps(data, indent=False):
+    return orjson.dumps(data, default=default, option=OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer encoding with orjson. `; indent=` in the accepted
+    media type produces two-space indentation (the only width orjson offers).
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type or '', renderer_context)
+        return dumps(data, indent=bool(indent))
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser decoding with orjson (UTF-8 only, NaN/Infinity rejected as with STRICT_JSON).
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -51,9 +51,52 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 500,
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # orjson-backed JSON (haus_config.renderers); same media type and output as DRF's JSONRenderer/JSONParser
+    'DEFAULT_RENDERER_CLASSES': [
+        'haus_config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'haus_config.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Listing search results (listings.result_cache); LocMemCache evicts least recently used
+    # entries beyond MAX_ENTRIES. Use FileBasedCache with a shared LOCATION to share across workers.
+    'listings': {
+        'BACKEND': os.getenv('LISTING_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('LISTING_CACHE_LOCATION', 'listing-results'),
+        'TIMEOUT': int(os.getenv('LISTING_CACHE_TIMEOUT', '600')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('LISTING_CACHE_MAX_ENTRIES', '500')),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+# Results whose pickled size exceeds this many bytes are not cached
+LISTING_CACHE_MAX_ITEM_BYTES = int(os.getenv('LISTING_CACHE_MAX_ITEM_BYTES', str(2 * 1024 * 1024)))
+
+# Backend used by FeatureRanker.recompute_all_scores: 'numpy' or 'sql'
+RANKING_SCORE_ENGINE = os.getenv('RANKING_SCORE_ENGINE', 'numpy')
+
+# When True, votes only queue a rescore for `manage.py rescore_worker`;
+# when False the rescore runs right after the vote commits
+RANKING_RESCORE_ASYNC = os.getenv('RANKING_RESCORE_ASYNC', 'True') == 'True'
+
+# Apply only the changes since the last rescore (DeltaScorer) instead of rescoring everything
+RANKING_INCREMENTAL_RESCORE = os.getenv('RANKING_INCREMENTAL_RESCORE', 'True') == 'True'
+
+# Hotspots beyond this count are merged into weighted centroids before the next rescore
+RANKING_HOTSPOT_LIMIT = int(os.getenv('RANKING_HOTSPOT_LIMIT', '256'))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from listings.views import ListingsViewSet
-from rankings.views import get_comparison_pair, submit_comparison, get_ranking_distribution, get_feature_insights, get_random_listing, get_candidates, get_subset_comparison_pair, reset_rankings
+from rankings.views import get_comparison_pair, submit_comparison, submit_comparison_batch, get_ranking_distribution, get_feature_insights, get_random_listing, get_candidates, get_subset_comparison_pair, reset_rankings, get_rescore_status, refit_preferences
 
 router = DefaultRouter()
 router.register(r'listings', ListingsViewSet, basename='listings')
@@ -12,10 +12,14 @@ urlpatterns = [
     path('api/comparisons/pair/', get_comparison_pair, name='comparison-pair'),
     path('api/comparisons/subset-pair/', get_subset_comparison_pair, name='comparison-subset-pair'),
     path('api/comparisons/random/', get_random_listing, name='random-listing'),
+    path('api/comparisons/batch/', submit_comparison_batch, name='comparison-submit-batch'),
     path('api/comparisons/', submit_comparison, name='comparison-submit'),
     path('api/candidates/', get_candidates, name='candidates'),
     path('api/rankings/distribution/', get_ranking_distribution, name='ranking-distribution'),
     path('api/rankings/insights/', get_feature_insights, name='ranking-insights'),
     path('api/rankings/reset/', reset_rankings, name='ranking-reset'),
+    path('api/rankings/status/', get_rescore_status, name='ranking-status'),
+    path('api/rankings/refit/', refit_preferences, name='ranking-refit'),
+    path('api/listings/tiles/<int:z>/<int:x>/<int:y>.mvt', ListingsViewSet.as_view({'get': 'tiles'}), name='listings-tiles'),
     path('api/', include(router.urls)),
 ]
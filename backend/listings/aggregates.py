@@ -0,0 +1,119 @@
+from django.db import connection
+
+# Grid cells per 256px map tile at the requested zoom (~32px clusters)
+CELLS_PER_TILE = 8
+
+
+def cell_size(zoom):
+    """
+    Grid cell size in degrees for a map zoom level.
+    """
+    return 360.0 / (2 ** zoom) / CELLS_PER_TILE
+
+
+def cluster_cells(qs, zoom):
+    """
+    Aggregates the listings of `qs` into ST_SnapToGrid cells sized for `zoom`.
+
+    Returns one dict per non-empty cell with the listing count, centroid and
+    min/median/max of price and ranking score; single-listing cells also
+    carry the listing id. `qs` must carry the ranking_score annotation
+    (see serializers.with_ranking_score).
+    """
+    rows_sql, rows_params = qs.order_by().values('id', 'location', 'list_price', 'ranking_score').query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT count(*),
+                   ST_X(ST_Centroid(ST_Collect(l.location))),
+                   ST_Y(ST_Centroid(ST_Collect(l.location))),
+                   min(l.list_price)::float8,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY l.list_price),
+                   max(l.list_price)::float8,
+                   min(l.ranking_score),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY l.ranking_score),
+                   max(l.ranking_score),
+                   CASE WHEN count(*) = 1 THEN min(l.id) END
+            FROM ({rows_sql}) l
+            WHERE l.location IS NOT NULL
+            GROUP BY ST_SnapToGrid(l.location, %s)
+        """, list(rows_params) + [cell_size(zoom)])
+        rows = cursor.fetchall()
+
+    return [
+        {
+            "count": count,
+            "longitude": lon,
+            "latitude": lat,
+            "price": {"min": price_min, "median": price_median, "max": price_max},
+            "score": {"min": score_min, "median": score_median, "max": score_max},
+            "id": listing_id,
+        }
+        for count, lon, lat, price_min, price_median, price_max, score_min, score_median, score_max, listing_id in rows
+    ]
+
+
+# Per-listing value averaged into each heatmap cell
+HEAT_METRICS = {
+    'price': "l.list_price::float8",
+    'price_per_sqft': "COALESCE(l.price_per_sqft::float8, l.list_price::float8 / NULLIF(l.sqft, 0))",
+    'score': "l.ranking_score",
+    'count': "NULL::float8",
+}
+DEFAULT_HEAT_RESOLUTION = 64
+MAX_HEAT_RESOLUTION = 256
+
+
+def heat_bounds(qs):
+    """
+    Bounding box (min_lon, min_lat, max_lon, max_lat) of the located listings in `qs`, or None.
+    """
+    rows_sql, rows_params = qs.order_by().values('location').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+            FROM (SELECT ST_Extent(l.location) AS e FROM ({rows_sql}) l) extent
+        """, rows_params)
+        bounds = cursor.fetchone()
+    return None if bounds[0] is None else bounds
+
+
+def heat_cells(qs, metric, bounds, resolution=DEFAULT_HEAT_RESOLUTION):
+    """
+    Bins the listings of `qs` into a square grid over `bounds`, `resolution`
+    cells across its longer side, and averages `metric` (a HEAT_METRICS key) per cell.
+
+    Returns (cell_size, columns) where columns holds parallel lists of cell
+    centre longitude/latitude, listing count and mean value (None if no listing
+    in the cell has the metric; the count itself for metric='count').
+    `qs` must carry the ranking_score annotation for metric='score'.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    size = max(max_lon - min_lon, max_lat - min_lat) / resolution or cell_size(22)
+    rows_sql, rows_params = qs.order_by().values(
+        'location', 'list_price', 'price_per_sqft', 'sqft', 'ranking_score'
+    ).query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT %s + (c.ix + 0.5) * %s, %s + (c.iy + 0.5) * %s, c.n, c.value
+            FROM (
+                SELECT floor((ST_X(l.location) - %s) / %s) AS ix,
+                       floor((ST_Y(l.location) - %s) / %s) AS iy,
+                       count(*) AS n,
+                       avg({HEAT_METRICS[metric]}) AS value
+                FROM ({rows_sql}) l
+                WHERE l.location IS NOT NULL
+                GROUP BY ix, iy
+            ) c
+            ORDER BY c.iy, c.ix
+        """, [min_lon, size, min_lat, size, min_lon, size, min_lat, size] + list(rows_params))
+        rows = cursor.fetchall()
+
+    columns = {
+        "longitude": [row[0] for row in rows],
+        "latitude": [row[1] for row in rows],
+        "count": [row[2] for row in rows],
+        "value": [row[2] if metric == 'count' else row[3] for row in rows],
+    }
+    return size, columns
@@ -0,0 +1,199 @@
+import csv
+import datetime
+import json
+from decimal import Decimal
+from itertools import islice
+from django.db import models
+from rest_framework.renderers import BaseRenderer
+
+# Rows fetched per round trip of the server-side cursor
+CHUNK_SIZE = 2000
+# Rows per Parquet row group (each one is flushed to the client as it is written)
+PARQUET_ROW_GROUP = 20000
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Marks an export format for content negotiation (?format= or Accept).
+    The export action streams its own response, so nothing is rendered here.
+    """
+    charset = None
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode() if data is not None else b''
+
+
+class NdjsonRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    extension = 'ndjson'
+
+
+class CsvRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+
+class GeoJsonRenderer(ExportRenderer):
+    media_type = 'application/geo+json'
+    format = 'geojson'
+    extension = 'geojson'
+
+
+class ParquetRenderer(ExportRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+    extension = 'parquet'
+
+
+EXPORT_RENDERERS = [NdjsonRenderer, CsvRenderer, GeoJsonRenderer, ParquetRenderer]
+
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+# Annotations exported alongside the model columns when requested and present on the queryset
+ANNOTATIONS = ['ranking_score', 'distance']
+
+
+def export_columns(qs, names):
+    """
+    Splits the requested field names into the tabular columns (everything but
+    the geometry, which is exported as latitude/longitude) in model order.
+    """
+    ordered = [f.name for f in qs.model._meta.concrete_fields if f.name in names and f.name != 'location']
+    return ordered + [name for name in ANNOTATIONS if name in names and name in qs.query.annotations]
+
+
+def iter_rows(qs, columns, chunk_size=CHUNK_SIZE):
+    """
+    Streams `columns` of every row in `qs` as dicts through a server-side cursor.
+    """
+    return qs.values(*columns).iterator(chunk_size=chunk_size)
+
+
+def ndjson_chunks(qs, columns):
+    for row in iter_rows(qs, columns):
+        yield json.dumps(row, default=json_default) + '\n'
+
+
+class Echo:
+    """
+    File-like object handing csv.writer's output straight back.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_chunks(qs, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in iter_rows(qs, columns):
+        yield writer.writerow([row[c] for c in columns])
+
+
+def geojson_chunks(qs, columns):
+    yield '{"type": "FeatureCollection", "features": ['
+    separator = ''
+    for row in iter_rows(qs, columns + ['location']):
+        location = row.pop('location')
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [location.x, location.y]} if location else None,
+            "properties": row,
+        }
+        yield separator + json.dumps(feature, default=json_default)
+        separator = ','
+    yield ']}\n'
+
+
+def parquet_schema(model, columns):
+    import pyarrow as pa
+
+    types = {}
+    for field in model._meta.concrete_fields:
+        if isinstance(field, models.DecimalField):
+            types[field.name] = pa.decimal128(field.max_digits, field.decimal_places)
+        elif isinstance(field, (models.FloatField,)):
+            types[field.name] = pa.float64()
+        elif isinstance(field, (models.IntegerField, models.AutoField)):
+            types[field.name] = pa.int64()
+        elif isinstance(field, models.BooleanField):
+            types[field.name] = pa.bool_()
+        elif isinstance(field, models.DateTimeField):
+            types[field.name] = pa.timestamp('us', tz='UTC')
+        elif isinstance(field, models.DateField):
+            types[field.name] = pa.date32()
+        else:
+            types[field.name] = pa.string()
+    types['ranking_score'] = types['distance'] = pa.float64()
+    return pa.schema([(c, types[c]) for c in columns])
+
+
+class ChunkSink:
+    """
+    Write-only file object that hands back whatever was written since the last take().
+    """
+    closed = False
+
+    def __init__(self):
+        self.parts, self.position = [], 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def parquet_chunks(qs, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(qs.model, columns)
+    sink = ChunkSink()
+    rows = iter_rows(qs, columns)
+    writer = pq.ParquetWriter(sink, schema)
+    while True:
+        batch = list(islice(rows, PARQUET_ROW_GROUP))
+        if not batch:
+            break
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+EXPORTERS = {
+    'ndjson': ndjson_chunks,
+    'csv': csv_chunks,
+    'geojson': geojson_chunks,
+    'parquet': parquet_chunks,
+}
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
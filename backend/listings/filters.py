@@ -1,7 +1,14 @@
 
 import django_filters
+from django_filters import utils
+import logging
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos import Polygon, GEOSGeometry
+from django.db.models import BooleanField, F, FloatField, Func, Value
 from .models import CurrentListing
 
+logger = logging.getLogger(__name__)
+
 class ListingFilter(django_filters.FilterSet):
     price_min = django_filters.NumberFilter(field_name='list_price', lookup_expr='gte')
     price_max = django_filters.NumberFilter(field_name='list_price', lookup_expr='lte')
@@ -21,3 +28,134 @@ class ListingFilter(django_filters.FilterSet):
     class Meta:
         model = CurrentListing
         fields = ['status', 'city', 'zip_code', 'state']
+
+
+# Upper bound for ?k= nearest-listing queries
+MAX_NEAREST = 1000
+
+GEOGRAPHY = GeometryField(geography=True, srid=4326)
+
+
+def geography_location():
+    # Matches the location::geography expression indexes (migration 0006)
+    return Func(F('location'), template='(%(expressions)s)::geography', output_field=GEOGRAPHY)
+
+
+def geography_point(lon, lat):
+    return Func(
+        Value(lon), Value(lat), template='ST_SetSRID(ST_MakePoint(%(expressions)s), 4326)::geography',
+        output_field=GEOGRAPHY
+    )
+
+
+def parse_near(value):
+    """
+    (lon, lat) from a ?near=lon,lat value; raises ValueError if malformed or out of range.
+    """
+    lon, lat = (float(v) for v in value.split(','))
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError(f"near out of range: {value}")
+    return lon, lat
+
+
+def within_radius(qs, lon, lat, meters):
+    """
+    Listings within `meters` of (lon, lat) on the spheroid; uses the geography index.
+    """
+    return qs.filter(Func(
+        geography_location(), geography_point(lon, lat), Value(float(meters)),
+        function='ST_DWithin', output_field=BooleanField()
+    ))
+
+
+def with_distance(qs, lon, lat):
+    """
+    Annotates `distance`, meters from (lon, lat) on the spheroid (None without a location).
+    """
+    return qs.annotate(distance=Func(
+        geography_location(), geography_point(lon, lat), function='ST_Distance', output_field=FloatField()
+    ))
+
+
+def nearest(qs, lon, lat, k):
+    """
+    The `k` located listings of `qs` closest to (lon, lat), found by a KNN (<->)
+    index scan; the ordering of `qs` is kept.
+    """
+    knn = Func(
+        geography_location(), geography_point(lon, lat),
+        template='%(expressions)s', arg_joiner=' <-> ', output_field=FloatField()
+    )
+    ids = qs.filter(location__isnull=False).order_by(knn).values('id')[:k]
+    return qs.filter(id__in=ids)
+
+
+def apply_spatial_filters(qs, params):
+    """
+    Applies the ?polygon=WKT, ?bbox=min_lon,min_lat,max_lon,max_lat and
+    ?near=lon,lat[&radius_m=] filters. With near, rows carry `distance`
+    (meters) and are ordered by it. Invalid values are logged and ignored.
+    """
+    # Polygon Filtering
+    polygon_wkt = params.get('polygon', None)
+    if polygon_wkt:
+        try:
+            # Expecting WKT POLYGON((...))
+            poly = GEOSGeometry(polygon_wkt)
+            qs = qs.filter(location__within=poly)
+        except Exception as e:
+            logger.error(f"Invalid polygon WKT: {e}")
+
+    # Bounding Box Filtering ?bbox=min_lon,min_lat,max_lon,max_lat
+    bbox = params.get('bbox', None)
+    if bbox:
+        try:
+            bbox_vals = [float(x) for x in bbox.split(',')]
+            if len(bbox_vals) == 4:
+                bbox_poly = Polygon.from_bbox(bbox_vals)
+                qs = qs.filter(location__within=bbox_poly)
+        except Exception as e:
+            logger.error(f"Invalid bbox: {e}")
+
+    # Radius Filtering ?near=lon,lat&radius_m= (?k= is applied by apply_nearest)
+    near = params.get('near', None)
+    if near:
+        try:
+            lon, lat = parse_near(near)
+            radius = params.get('radius_m', None)
+            if radius:
+                qs = within_radius(qs, lon, lat, float(radius))
+            qs = with_distance(qs, lon, lat).order_by('distance')
+        except Exception as e:
+            logger.error(f"Invalid near/radius_m: {e}")
+
+    return qs
+
+
+def apply_nearest(qs, params):
+    """
+    Applies ?near=lon,lat&k=: keeps the k listings of `qs` closest to the point.
+    Runs after every other filter, so k counts matching listings only.
+    """
+    near, k = params.get('near', None), params.get('k', None)
+    if near and k:
+        try:
+            lon, lat = parse_near(near)
+            qs = nearest(qs, lon, lat, max(1, min(int(k), MAX_NEAREST)))
+        except Exception as e:
+            logger.error(f"Invalid near/k: {e}")
+    return qs
+
+
+def filter_listings(params, qs=None):
+    """
+    The filtering of /api/listings/ (ListingFilter plus spatial filters) for use outside ListingsViewSet.
+    Invalid filter values raise ValidationError (a 400 in API views), as with DjangoFilterBackend.
+    """
+    if qs is None:
+        qs = CurrentListing.objects.all()
+    filterset = ListingFilter(params, queryset=qs)
+    if not filterset.is_valid():
+        raise utils.translate_validation(filterset.errors)
+    qs = filterset.qs
+    return apply_nearest(apply_spatial_filters(qs, params), params)
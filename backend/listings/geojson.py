@@ -0,0 +1,74 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, models
+from django.db.models import Window
+from django.db.models.functions import RowNumber
+from .export import ExportRenderer, export_columns
+
+CONTENT_TYPE = 'application/geo+json'
+
+# DRF's DateTimeField output in UTC: ISO 8601 with a Z, microseconds only when non-zero
+DATETIME_SQL = (
+    "to_char({column} AT TIME ZONE 'UTC', CASE WHEN date_trunc('second', {column}) = {column} "
+    "THEN 'YYYY-MM-DD\"T\"HH24:MI:SS\"Z\"' ELSE 'YYYY-MM-DD\"T\"HH24:MI:SS.US\"Z\"' END)"
+)
+
+
+class GeoJsonFastRenderer(ExportRenderer):
+    """
+    ?format=geojson-fast on /api/listings/: ListingsViewSet.list returns the
+    FeatureCollection built by feature_collection() as-is.
+    """
+    media_type = CONTENT_TYPE
+    format = 'geojson-fast'
+    extension = 'geojson'
+
+
+def property_sql(model, column):
+    """
+    SQL for one feature property, rendered as the serializer renders it:
+    decimals as strings and datetimes in DRF's format.
+    """
+    sql = f"l.{connection.ops.quote_name(column)}"
+    try:
+        field = model._meta.get_field(column)
+    except FieldDoesNotExist:
+        # Annotations (ranking_score, distance) are floats
+        return sql
+    if isinstance(field, models.DecimalField):
+        return f"{sql}::text"
+    if isinstance(field, models.DateTimeField):
+        return DATETIME_SQL.format(column=sql)
+    return sql
+
+
+def feature_collection(qs, fields, limit=None):
+    """
+    Renders the listings of `qs` as a GeoJSON FeatureCollection in PostgreSQL.
+
+    `fields` are the serializer field names to expose as properties (the
+    geometry is always `location`), with the values ListingListSerializer would
+    output. Features follow the ordering of `qs`, at most `limit` of them. Rows
+    are never turned into model instances; the result is the encoded JSON document.
+    """
+    columns = export_columns(qs, fields)
+    rows = qs.values(*columns, 'location').annotate(
+        feature_order=Window(RowNumber(), order_by=list(qs.query.order_by) or ['id'])
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    rows_sql, rows_params = rows.query.sql_with_params()
+    properties = ', '.join(f"'{column}', {property_sql(qs.model, column)}" for column in columns)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT json_build_object(
+                'type', 'FeatureCollection',
+                'features', COALESCE(json_agg(json_build_object(
+                    'type', 'Feature',
+                    'geometry', ST_AsGeoJSON(l.location)::json,
+                    'properties', json_build_object({properties})
+                ) ORDER BY l.feature_order), '[]'::json)
+            )::text
+            FROM ({rows_sql}) l
+        """, rows_params)
+        return cursor.fetchone()[0].encode()
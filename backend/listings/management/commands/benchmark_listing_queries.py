@@ -0,0 +1,127 @@
+import random
+import re
+from datetime import timedelta
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from listings.models import MlsHistory, CurrentListing
+from listings.views import ListingsViewSet
+from rankings.models import RankingScore
+
+# Synthetic listings are spread over this box (greater Boston)
+MIN_LON, MIN_LAT, MAX_LON, MAX_LAT = -71.25, 42.20, -70.95, 42.45
+CITIES = ['Boston', 'Cambridge', 'Somerville', 'Brookline', 'Newton', 'Quincy']
+STATUSES = ['FOR_SALE', 'PENDING', 'SOLD']
+
+# Representative /api/listings/ requests: (name, query params)
+API_QUERIES = [
+    ('bbox', {'bbox': '-71.10,42.33,-71.05,42.37'}),
+    ('polygon', {'polygon': 'POLYGON((-71.10 42.33, -71.05 42.33, -71.05 42.37, -71.10 42.33))'}),
+    ('price range', {'price_min': '400000', 'price_max': '600000'}),
+    ('beds/baths/sqft', {'beds_min': '4', 'baths_min': '3', 'sqft_min': '2500'}),
+    ('price per sqft', {'pps_min': '500', 'pps_max': '550'}),
+    ('city + status', {'city': 'Quincy', 'status': 'PENDING'}),
+    ('zip code', {'zip_code': '02101'}),
+    ('bbox + price, by ranking score', {'bbox': '-71.10,42.33,-71.05,42.37', 'price_max': '700000', 'sort': '-ranking_score'}),
+    ('custom sort', {'custom_sort': 'list_price/sqft', 'direction': 'desc'}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads a synthetic listing history and runs EXPLAIN ANALYZE on the representative "
+        "/api/listings/ queries, reporting each plan and its execution time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=20000, help="Number of synthetic listings.")
+        parser.add_argument('--snapshots', type=int, default=3, help="Snapshots per synthetic listing.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic data.")
+        parser.add_argument('--existing', action='store_true', help="Benchmark the existing data instead of synthetic rows.")
+        parser.add_argument('--keep', action='store_true', help="Commit the synthetic rows instead of rolling them back.")
+        parser.add_argument('--quiet', action='store_true', help="Print only the timing summary, not the plans.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not options['existing']:
+                self.load_synthetic(options['listings'], options['snapshots'], options['seed'])
+
+            timings = [(name, self.explain(name, qs, options['quiet'])) for name, qs in self.queries()]
+
+            self.stdout.write("\nSummary (execution time, ms):")
+            for name, ms in timings:
+                self.stdout.write(f"  {ms:>10.3f}  {name}")
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def load_synthetic(self, listings, snapshots, seed):
+        """
+        Inserts `listings` x `snapshots` MlsHistory rows with scores, refreshes
+        current_listings and updates planner statistics.
+        """
+        rng = random.Random(seed)
+        now = timezone.now()
+        rows = []
+        for n in range(listings):
+            lon, lat = rng.uniform(MIN_LON, MAX_LON), rng.uniform(MIN_LAT, MAX_LAT)
+            sqft = rng.randint(600, 5000)
+            price = rng.randint(150, 900) * sqft
+            base = dict(
+                listing_id=f'bench-{seed}-{n}', city=rng.choice(CITIES), state='MA',
+                zip_code=f'02{rng.randint(100, 199)}', beds=rng.randint(1, 6), full_baths=rng.randint(1, 4),
+                sqft=sqft, year_built=rng.randint(1880, 2024), latitude=lat, longitude=lon,
+                location=Point(lon, lat, srid=4326), formatted_address=f'{n} Benchmark St',
+            )
+            for k in range(snapshots):
+                # Later snapshots drift in price and status like real re-listings
+                snapshot_price = round(price * (1 - 0.02 * k))
+                rows.append(MlsHistory(
+                    **base, status=rng.choice(STATUSES), list_price=snapshot_price,
+                    price_per_sqft=round(snapshot_price / sqft, 2),
+                ))
+
+        created = MlsHistory.objects.bulk_create(rows, batch_size=5000)
+        RankingScore.objects.bulk_create(
+            [RankingScore(listing_id=row.id, score=rng.gauss(0, 100)) for row in created], batch_size=5000
+        )
+        # auto_now_add stamps every row with the same time; spread the snapshots out
+        MlsHistory.objects.filter(id__in=[row.id for row in created[1::2]]).update(
+            scrape_timestamp=now - timedelta(days=1)
+        )
+
+        CurrentListing.refresh(concurrently=False)
+        with connection.cursor() as cursor:
+            for table in ('listings_mlshistory', 'current_listings', 'rankings_rankingscore'):
+                cursor.execute(f"ANALYZE {table}")
+        self.stdout.write(f"Loaded {len(created)} synthetic snapshots of {listings} listings.")
+
+    def queries(self):
+        """
+        Yields (name, queryset) for each benchmarked query, built by the real API code paths.
+        """
+        factory = APIRequestFactory()
+        for name, params in API_QUERIES:
+            view = ListingsViewSet(action='list', format_kwarg=None, kwargs={})
+            view.request = Request(factory.get('/api/listings/', params))
+            qs = view.filter_queryset(view.get_queryset())
+            if not qs.ordered:
+                qs = qs.order_by('id')
+            page_size = view.paginator.page_size or 500
+            yield f"list: {name}", qs[:page_size]
+
+        listing_id = CurrentListing.objects.values_list('listing_id', flat=True).first()
+        yield 'history by listing_id', MlsHistory.objects.filter(listing_id=listing_id).order_by('scrape_timestamp')
+
+    def explain(self, name, qs, quiet=False):
+        """
+        Runs EXPLAIN ANALYZE for one queryset, prints the plan and returns the execution time in ms.
+        """
+        plan = qs.explain(analyze=True, buffers=True)
+        match = re.search(r'Execution Time: ([\d.]+) ms', plan)
+        if not quiet:
+            self.stdout.write(f"\n=== {name} ===\n{plan}")
+        return float(match.group(1)) if match else float('nan')
@@ -0,0 +1,74 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from listings.management.commands.benchmark_listing_queries import Command as QueryBenchmark
+from listings.result_cache import ListingResultCache
+from listings.views import ListingsViewSet
+
+# Covers the whole synthetic box
+BBOX = '-71.25,42.20,-70.95,42.45'
+
+# (name, query params, renderer classes or None for the configured ones): a 500-row page
+# through the serializer with the stdlib and orjson renderers, and the map query through PostgreSQL
+CASES = [
+    ('serializer, stdlib json', {'bbox': BBOX}, [JSONRenderer]),
+    ('serializer, orjson', {'bbox': BBOX}, None),
+    ('geojson-fast', {'bbox': BBOX, 'format': 'geojson-fast'}, None),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times end-to-end /api/listings/ responses (query, serialization and rendering) "
+        "for each output path, with the result cache bypassed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=5000, help="Number of synthetic listings.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic data.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed requests per case (the median is reported).")
+        parser.add_argument('--existing', action='store_true', help="Benchmark the existing data instead of synthetic rows.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not options['existing']:
+                QueryBenchmark(stdout=self.stdout).load_synthetic(options['listings'], 1, options['seed'])
+
+            self.stdout.write(f"\n{'case':<26}{'rows':>8}{'KB':>10}{'ms':>10}{'render ms':>11}{'us/row':>10}")
+            for name, params, renderers in CASES:
+                rows, size, ms, render_ms = self.time(params, renderers, options['repeat'])
+                per_row = ms * 1000 / rows if rows else float('nan')
+                self.stdout.write(
+                    f"{name:<26}{rows:>8}{size / 1024:>10.1f}{ms:>10.2f}{render_ms:>11.2f}{per_row:>10.1f}"
+                )
+
+            transaction.set_rollback(True)
+
+    def time(self, params, renderers, repeat):
+        """
+        Returns (rows, response bytes, median total ms, median render ms) for
+        `repeat` /api/listings/ requests.
+        """
+        initkwargs = {'renderer_classes': renderers} if renderers else {}
+        view = ListingsViewSet.as_view({'get': 'list'}, **initkwargs)
+        factory = APIRequestFactory()
+        timings, render_timings = [], []
+        for _ in range(repeat):
+            ListingResultCache.cache().clear()
+            start = time.perf_counter()
+            response = view(factory.get('/api/listings/', params))
+            served = time.perf_counter()
+            if hasattr(response, 'render'):
+                response.render()
+            content = response.content
+            end = time.perf_counter()
+            timings.append((end - start) * 1000)
+            render_timings.append((end - served) * 1000)
+
+        body = json.loads(content)
+        rows = len(body['features'] if 'features' in body else body['results'])
+        return rows, len(content), statistics.median(timings), statistics.median(render_timings)
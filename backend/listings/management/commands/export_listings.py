@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from listings.export import EXPORTERS, export_columns, parquet_available
+from listings.serializers import ListingSerializer, SparseFieldsetMixin
+from listings.views import ListingsViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the current listings to a file as NDJSON, CSV, GeoJSON or Parquet. "
+        "Accepts the /api/listings/ query parameters, e.g. --param city=Boston --param sort=-ranking_score."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Output file path ('-' for stdout; not for parquet).")
+        parser.add_argument('--format', choices=sorted(EXPORTERS), default='ndjson', help="Output format.")
+        parser.add_argument(
+            '--param', action='append', default=[], metavar='KEY=VALUE',
+            help="Filter, sort or fields parameter as accepted by /api/listings/ (repeatable)."
+        )
+
+    def handle(self, *args, **options):
+        fmt, output = options['format'], options['output']
+        if fmt == 'parquet' and not parquet_available():
+            raise CommandError("Parquet export requires pyarrow")
+        if fmt == 'parquet' and output == '-':
+            raise CommandError("Parquet export needs an output file")
+
+        params = {}
+        for param in options['param']:
+            key, sep, value = param.partition('=')
+            if not sep:
+                raise CommandError(f"Expected KEY=VALUE, got {param!r}")
+            params[key] = value
+
+        # Same filters and ordering as the API endpoint
+        view = ListingsViewSet(action='export', format_kwarg=None, kwargs={})
+        view.request = Request(APIRequestFactory().get('/api/listings/export/', params))
+        qs = view.filter_queryset(view.get_queryset())
+        fields = SparseFieldsetMixin.requested_fields(view.request.query_params, ListingSerializer().fields)
+        columns = export_columns(qs, fields)
+
+        chunks = EXPORTERS[fmt](qs, columns)
+        if output == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        mode, encoding = ('wb', None) if fmt == 'parquet' else ('w', 'utf-8')
+        with open(output, mode, encoding=encoding, newline='' if encoding else None) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(f"Wrote {fmt} export to {output}.")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from listings.models import CurrentListing
+
+
+class Command(BaseCommand):
+    help = "Refreshes the current_listings materialized view from listings_mlshistory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocking', action='store_true', help="Refresh without CONCURRENTLY (locks out readers).")
+
+    def handle(self, *args, **options):
+        CurrentListing.refresh(concurrently=not options['blocking'])
+        self.stdout.write(f"Refreshed current_listings ({CurrentListing.objects.count()} listings).")
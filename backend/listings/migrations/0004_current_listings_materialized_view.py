@@ -0,0 +1,41 @@
+# Generated by Django 5.2.9 on 2026-10-17 14:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0003_currentlisting"),
+    ]
+
+    # The latest snapshot of each listing. Snapshots without a listing_id are
+    # kept as listings of their own. SELECT * is expanded when the view is
+    # created, so columns added to MlsHistory later need the view recreated.
+    # Refreshed by the scraper after every run (see CurrentListing.refresh).
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                DROP VIEW IF EXISTS current_listings;
+                CREATE MATERIALIZED VIEW current_listings AS
+                SELECT DISTINCT ON (COALESCE(listing_id, 'id:' || id::text)) *
+                FROM listings_mlshistory
+                ORDER BY COALESCE(listing_id, 'id:' || id::text), scrape_timestamp DESC, id DESC;
+
+                -- REFRESH ... CONCURRENTLY requires a unique index
+                CREATE UNIQUE INDEX current_listings_id_uniq ON current_listings (id);
+                CREATE INDEX current_listings_location_gist ON current_listings USING gist (location);
+                CREATE INDEX current_listings_listing_id_idx ON current_listings (listing_id);
+                CREATE INDEX current_listings_list_price_idx ON current_listings (list_price);
+                CREATE INDEX current_listings_sqft_idx ON current_listings (sqft);
+                CREATE INDEX current_listings_beds_idx ON current_listings (beds);
+                CREATE INDEX current_listings_full_baths_idx ON current_listings (full_baths);
+                CREATE INDEX current_listings_price_per_sqft_idx ON current_listings (price_per_sqft);
+                CREATE INDEX current_listings_status_idx ON current_listings (status);
+                CREATE INDEX current_listings_city_idx ON current_listings (city);
+                CREATE INDEX current_listings_zip_code_idx ON current_listings (zip_code);
+                CREATE INDEX current_listings_state_idx ON current_listings (state);
+            """,
+            reverse_sql="DROP MATERIALIZED VIEW IF EXISTS current_listings;",
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.9 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0004_current_listings_materialized_view"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["list_price"], name="mlshistory_list_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["sqft"], name="mlshistory_sqft_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["beds"], name="mlshistory_beds_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["full_baths"], name="mlshistory_full_baths_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["price_per_sqft"], name="mlshistory_pps_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["zip_code"], name="mlshistory_zip_code_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["city"], name="mlshistory_city_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["status"], name="mlshistory_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mlshistory",
+            index=models.Index(fields=["listing_id", "scrape_timestamp"], name="mlshistory_listing_scrape_idx"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-17 18:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0005_mlshistory_indexes"),
+    ]
+
+    # Expression indexes on location::geography for the ?near= radius
+    # (ST_DWithin) and nearest-listing (<->) queries, which measure in meters.
+    # The expression must match the one in listings.filters exactly.
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX current_listings_location_geog_idx ON current_listings USING gist ((location::geography));
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS current_listings_location_geog_idx;
+            """,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-17 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0006_geography_location_indexes"),
+    ]
+
+    # Indexes used by rankings.delta_scoring.DeltaScorer: the hotspot term is computed
+    # from latitude/longitude rather than `location`, so the spatial index is built on
+    # the same expression. IF NOT EXISTS: rankings 0007 used to create them.
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX IF NOT EXISTS listings_mlshistory_latlon_gist
+                ON listings_mlshistory
+                USING gist (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326));
+                CREATE INDEX IF NOT EXISTS listings_mlshistory_neighborhoods_idx
+                ON listings_mlshistory (neighborhoods);
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS listings_mlshistory_latlon_gist;
+                DROP INDEX IF EXISTS listings_mlshistory_neighborhoods_idx;
+            """,
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.gis.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.db import connection
 
 class ListingBase(models.Model):
     # Core Fields
@@ -89,9 +90,40 @@ class ListingBase(models.Model):
         return f"{self.formatted_address} - {self.list_price}"
 
 class MlsHistory(ListingBase):
-    pass
+    # `location` already carries a GiST index (PointField spatial_index);
+    # these cover the ListingFilter range/equality filters and the history lookup
+    class Meta:
+        indexes = [
+            models.Index(fields=['list_price'], name='mlshistory_list_price_idx'),
+            models.Index(fields=['sqft'], name='mlshistory_sqft_idx'),
+            models.Index(fields=['beds'], name='mlshistory_beds_idx'),
+            models.Index(fields=['full_baths'], name='mlshistory_full_baths_idx'),
+            models.Index(fields=['price_per_sqft'], name='mlshistory_pps_idx'),
+            models.Index(fields=['zip_code'], name='mlshistory_zip_code_idx'),
+            models.Index(fields=['city'], name='mlshistory_city_idx'),
+            models.Index(fields=['status'], name='mlshistory_status_idx'),
+            models.Index(fields=['listing_id', 'scrape_timestamp'], name='mlshistory_listing_scrape_idx'),
+        ]
 
 class CurrentListing(ListingBase):
+    """
+    Latest snapshot of each listing: a materialized view over listings_mlshistory
+    (migration 0004) that shares its ids.
+    """
     class Meta:
         managed = False
         db_table = 'current_listings'
+
+    @classmethod
+    def refresh(cls, concurrently=True):
+        """
+        Rebuilds the view from listings_mlshistory. CONCURRENTLY keeps it readable meanwhile.
+        Bumps the ingest generation, which invalidates conditional GETs on listing data.
+        """
+        from rankings.versions import DataVersions
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{cls._meta.db_table}"
+            )
+        return DataVersions.bump_ingest()
@@ -0,0 +1,137 @@
+import base64
+import json
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from .export import json_default
+
+
+class ListingCursorPagination(BasePagination):
+    """
+    Keyset pagination for /api/listings/.
+
+    Pages are cut on (sort value, id) instead of an OFFSET, so every page
+    costs the same and a scrape landing between two requests does not
+    shift rows across pages. The sort is taken from the queryset's first
+    ordering term (ListingsViewSet.get_queryset: id, custom_metric or
+    ranking_score); NULL sort values come last and id breaks ties.
+
+    The total is only computed on request: ?count=exact runs COUNT(*),
+    ?count=estimate reads the planner's row estimate.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def sort_key(self, queryset):
+        """
+        Returns (field, descending) for the queryset's primary ordering, defaulting to id.
+        """
+        ordering = queryset.query.order_by
+        if not ordering or not isinstance(ordering[0], str):
+            return 'id', False
+        field = ordering[0]
+        return field.lstrip('-'), field.startswith('-')
+
+    def order(self, queryset, field, descending, nulls_first):
+        """
+        Orders by (field, id), both in the same direction.
+        """
+        nulls = {'nulls_first': True} if nulls_first else {'nulls_last': True}
+        expression = F(field).desc(**nulls) if descending else F(field).asc(**nulls)
+        return queryset.order_by(expression, '-id' if descending else 'id')
+
+    def after(self, field, value, last_id, descending, nulls_first):
+        """
+        Filter matching the rows that come after (value, last_id) in the given ordering.
+        """
+        cmp = 'lt' if descending else 'gt'
+        same = Q(**{field: value}) if value is not None else Q(**{f'{field}__isnull': True})
+        condition = same & Q(**{f'id__{cmp}': last_id})
+        if value is None:
+            if nulls_first:
+                condition |= Q(**{f'{field}__isnull': False})
+        else:
+            condition |= Q(**{f'{field}__{cmp}': value})
+            if not nulls_first:
+                condition |= Q(**{f'{field}__isnull': True})
+        return condition
+
+    def decode_cursor(self, request):
+        """
+        Cursor from the query string: {'v': sort value, 'id': last id, 'r': paging backwards}.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return {'v': cursor['v'], 'id': int(cursor['id']), 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        # Sort values can be Decimal (numeric arithmetic in custom_sort) or datetimes
+        cursor = {'v': getattr(row, self.field), 'id': row.id, 'r': int(reverse)}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, default=json_default).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def count_rows(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            # Django unwraps the one-element list PostgreSQL returns
+            if isinstance(plan, list):
+                plan = plan[0]
+            return int(plan['Plan']['Plan Rows'])
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.field, descending = self.sort_key(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        self.count = self.count_rows(queryset, request)
+
+        # Paging backwards walks the reversed ordering (NULLs first) and flips the page
+        walk_descending, nulls_first = descending != reverse, reverse
+        qs = self.order(queryset, self.field, walk_descending, nulls_first)
+        if cursor:
+            qs = qs.filter(self.after(self.field, cursor['v'], cursor['id'], walk_descending, nulls_first))
+
+        rows = list(qs[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.rows = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+from functools import wraps
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry, WKTWriter
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+from rest_framework.response import Response
+from rankings.versions import DataVersions
+
+logger = logging.getLogger(__name__)
+
+
+class ListingResultCache:
+    """
+    Cache of listing search results in the 'listings' cache alias.
+
+    Keys are built from the request path and normalized parameters:
+    parameter order does not matter, bbox coordinates are rounded to
+    BBOX_DECIMALS places (about 10 m), so map views that differ by a few
+    pixels share an entry, and polygons are compared in canonical form.
+    The negotiated format is part of the key, since ?format= and Accept
+    select different representations of the same URL.
+    The ingest generation and scores_version are part of the key, so any
+    scrape or rescore makes old entries unreachable; the backend's LRU
+    eviction then reclaims them.
+
+    Hit and miss counters live in the same cache (see stats()).
+    """
+    ALIAS = 'listings'
+    BBOX_DECIMALS = 4
+    POLYGON_DECIMALS = 6
+    SCOPES = ('ingest', 'scores')
+    HITS_KEY = 'stats:hits'
+    MISSES_KEY = 'stats:misses'
+
+    @classmethod
+    def cache(cls):
+        return caches[cls.ALIAS]
+
+    @classmethod
+    def normalize_bbox(cls, value):
+        try:
+            coords = [round(float(v), cls.BBOX_DECIMALS) for v in value.split(',')]
+        except ValueError:
+            return value
+        return ','.join(f'{c:.{cls.BBOX_DECIMALS}f}' for c in coords)
+
+    @classmethod
+    def normalize_polygon(cls, value):
+        try:
+            geometry = GEOSGeometry(value)
+            geometry.normalize()
+        except Exception:
+            return value
+        writer = WKTWriter(precision=cls.POLYGON_DECIMALS)
+        return writer.write(geometry).decode()
+
+    @classmethod
+    def normalize(cls, params):
+        """
+        Canonical, hashable form of the query parameters.
+        """
+        normalized = []
+        for key in sorted(params):
+            values = params.getlist(key)
+            if key == 'bbox':
+                values = [cls.normalize_bbox(v) for v in values]
+            elif key == 'polygon':
+                values = [cls.normalize_polygon(v) for v in values]
+            normalized.append((key, tuple(sorted(values))))
+        return tuple(normalized)
+
+    @classmethod
+    def key(cls, request):
+        versions = DataVersions.for_request(request, cls.SCOPES)
+        renderer = getattr(request, 'accepted_renderer', None)
+        raw = repr((
+            request.path, cls.normalize(request.GET), getattr(renderer, 'format', None),
+            sorted((s, v[0]) for s, v in versions.items())
+        ))
+        return f'result:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+    @classmethod
+    def record(cls, hit):
+        cache = cls.cache()
+        key = cls.HITS_KEY if hit else cls.MISSES_KEY
+        # add() is a no-op if the counter exists; counters are never expired
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, timeout=None)
+
+    @classmethod
+    def stats(cls):
+        """
+        Hit/miss counters since the cache was last cleared.
+        """
+        counts = cls.cache().get_many([cls.HITS_KEY, cls.MISSES_KEY])
+        hits, misses = counts.get(cls.HITS_KEY, 0), counts.get(cls.MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else None,
+            "backend": settings.CACHES[cls.ALIAS]['BACKEND'],
+            "max_entries": settings.CACHES[cls.ALIAS].get('OPTIONS', {}).get('MAX_ENTRIES'),
+        }
+
+    @classmethod
+    def pack(cls, response):
+        """
+        Picklable form of a successful response, or None if it should not be cached.
+        """
+        if response.status_code != 200:
+            return None
+        if isinstance(response, Response):
+            return ('data', response.data)
+        return ('content', response.content, response['Content-Type'], {
+            header: response[header] for header in response.headers
+            if header.startswith('X-') or header == 'Cache-Control'
+        })
+
+    @classmethod
+    def unpack(cls, entry):
+        if entry[0] == 'data':
+            return Response(entry[1])
+        _, content, content_type, headers = entry
+        response = HttpResponse(content, content_type=content_type)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+
+def cached_result(view):
+    """
+    View decorator serving GET requests from ListingResultCache.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+
+        cache = ListingResultCache.cache()
+        key = ListingResultCache.key(request)
+        entry = cache.get(key)
+        ListingResultCache.record(hit=entry is not None)
+        if entry is not None:
+            return ListingResultCache.unpack(entry)
+
+        response = view(request, *args, **kwargs)
+        entry = ListingResultCache.pack(response)
+        if entry is None:
+            return response
+
+        def store(rendered):
+            # Sized by the rendered body, so large pages are not serialized twice
+            size = len(rendered.content)
+            if size <= settings.LISTING_CACHE_MAX_ITEM_BYTES:
+                cache.set(key, entry)
+            else:
+                logger.debug(f"Not caching {request.path}: {size} bytes")
+
+        if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+    return wrapped
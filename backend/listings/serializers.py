@@ -1,22 +1,82 @@
 from rest_framework import serializers
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from .models import CurrentListing, MlsHistory
 from rankings.models import RankingScore
 
-class ListingSerializer(serializers.ModelSerializer):
+# Score reported for listings that have no RankingScore row yet
+DEFAULT_RANKING_SCORE = 1000.0
+
+
+def with_ranking_score(qs):
+    """
+    Annotates `ranking_score` on a listing queryset in the same query, so
+    ListingSerializer does not look up the score row by row.
+    """
+    score = RankingScore.objects.filter(listing_id=OuterRef('pk')).values('score')[:1]
+    return qs.annotate(ranking_score=Coalesce(Subquery(score), Value(DEFAULT_RANKING_SCORE)))
+
+
+class SparseFieldsetMixin:
+    """
+    Narrows the serialized fields with ?fields=a,b and/or ?omit=c,d on the
+    request in the serializer context. `id` is always kept.
+    """
+    @staticmethod
+    def requested_fields(params, available):
+        selected = set(available)
+        if params.get('fields'):
+            selected &= {name.strip() for name in params['fields'].split(',')} | {'id'}
+        if params.get('omit'):
+            selected -= {name.strip() for name in params['omit'].split(',')} - {'id'}
+        return selected
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        for name in set(self.fields) - self.requested_fields(request.query_params, self.fields):
+            self.fields.pop(name)
+
+
+class ListingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     ranking_score = serializers.SerializerMethodField()
+    # Meters from ?near=; only present when the queryset is annotated with it
+    distance = serializers.FloatField(read_only=True)
+    # Feature-space distance from a "more like this" seed (ListingSimilarity); lower is more alike
+    similarity_distance = serializers.FloatField(read_only=True)
 
     class Meta:
         model = CurrentListing
         fields = '__all__'
 
     def get_ranking_score(self, obj):
+        # Querysets passed through with_ranking_score already carry the score
+        if hasattr(obj, 'ranking_score'):
+            return obj.ranking_score
+
         # Since CurrentListing might be a view or just another model on the same table
         # we try to get the RankingScore for the MlsHistory instance with the same ID
         try:
             score_obj = RankingScore.objects.get(listing_id=obj.id)
             return score_obj.score
         except RankingScore.DoesNotExist:
-            return 1000.0
+            return DEFAULT_RANKING_SCORE
+
+class ListingListSerializer(ListingSerializer):
+    """
+    Compact row for list/map views: drops the description, histories, photos
+    beyond the first, schools and agent/office contacts that only the detail view shows.
+    """
+    class Meta:
+        model = CurrentListing
+        fields = [
+            'id', 'listing_id', 'mls_id', 'status', 'scrape_timestamp',
+            'formatted_address', 'city', 'state', 'zip_code', 'latitude', 'longitude',
+            'style', 'beds', 'full_baths', 'half_baths', 'sqft', 'lot_sqft', 'year_built',
+            'list_price', 'price_per_sqft', 'hoa_fee', 'primary_photo', 'ranking_score', 'distance', 'similarity_distance',
+        ]
 
 class MlsHistorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,3 +1,616 @@
+from django.contrib.gis.geos import Point
 from django.test import TestCase
+from rest_framework.test import APIClient
+from listings.models import MlsHistory, CurrentListing
+from listings.result_cache import ListingResultCache
+from listings.tiles import tile_bounds
 
-# Create your tests here.
+
+class ListingAPITestCase(TestCase):
+    """
+    Result cache keys are built from data generations, which restart with
+    every rolled-back test; start each test from an empty cache.
+    """
+    def setUp(self):
+        ListingResultCache.cache().clear()
+
+
+class CurrentListingViewTests(TestCase):
+    def test_latest_snapshot_per_listing(self):
+        MlsHistory.objects.create(listing_id='L1', list_price=500000)
+        latest = MlsHistory.objects.create(listing_id='L1', list_price=450000)
+        unnamed = MlsHistory.objects.create(list_price=300000)
+        other_unnamed = MlsHistory.objects.create(list_price=310000)
+
+        CurrentListing.refresh(concurrently=False)
+
+        self.assertCountEqual(
+            CurrentListing.objects.values_list('id', flat=True),
+            [latest.id, unnamed.id, other_unnamed.id]
+        )
+        self.assertEqual(CurrentListing.objects.get(listing_id='L1').list_price, 450000)
+
+    def test_concurrent_refresh_picks_up_new_snapshots(self):
+        MlsHistory.objects.create(listing_id='L2', list_price=100000)
+        CurrentListing.refresh()
+        MlsHistory.objects.create(listing_id='L2', list_price=90000)
+        CurrentListing.refresh()
+        self.assertEqual(CurrentListing.objects.get(listing_id='L2').list_price, 90000)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_benchmark_reports_every_query_and_rolls_back(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('benchmark_listing_queries', listings=30, snapshots=2, quiet=True, stdout=out)
+
+        summary = out.getvalue().split("Summary")[1]
+        self.assertIn('list: bbox', summary)
+        self.assertIn('history by listing_id', summary)
+        self.assertFalse(MlsHistory.objects.exists())
+
+
+class VectorTileTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        for i, price in enumerate([300000, 600000]):
+            MlsHistory.objects.create(
+                listing_id=f'T{i}', list_price=price, beds=3,
+                latitude=42.36, longitude=-71.06 + i * 0.01, location=Point(-71.06 + i * 0.01, 42.36, srid=4326)
+            )
+        CurrentListing.refresh(concurrently=False)
+
+    def test_tile_bounds(self):
+        min_lon, min_lat, max_lon, max_lat = tile_bounds(0, 0, 0)
+        self.assertEqual((min_lon, max_lon), (-180.0, 180.0))
+        self.assertAlmostEqual(max_lat, 85.0511287798, places=6)
+        self.assertAlmostEqual(min_lat, -max_lat)
+        self.assertEqual(tile_bounds(1, 1, 0)[:2], (0.0, 0.0))
+
+    def test_tile_contains_listings(self):
+        response = self.client.get('/api/listings/tiles/0/0/0.mvt')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'listings', response.content)
+
+    def test_tile_honors_filters(self):
+        response = self.client.get('/api/listings/tiles/0/0/0.mvt', {'price_min': 1000000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+        # Boston is in the north-west quadrant at zoom 1
+        response = self.client.get('/api/listings/tiles/1/1/0.mvt')
+        self.assertEqual(response.content, b'')
+
+    def test_tile_out_of_range(self):
+        response = self.client.get('/api/listings/tiles/1/2/0.mvt')
+        self.assertEqual(response.status_code, 404)
+
+
+class ClusterTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        # Two listings a few metres apart and one across town
+        for i, (lon, lat, price) in enumerate([(-71.0600, 42.3600, 400000), (-71.0601, 42.3601, 800000), (-71.2, 42.4, 500000)]):
+            MlsHistory.objects.create(
+                listing_id=f'C{i}', list_price=price, latitude=lat, longitude=lon, location=Point(lon, lat, srid=4326)
+            )
+        CurrentListing.refresh(concurrently=False)
+
+    def test_clusters_by_zoom(self):
+        response = self.client.get('/api/listings/clusters/', {'zoom': 12})
+        self.assertEqual(response.status_code, 200)
+        clusters = sorted(response.data['clusters'], key=lambda c: -c['count'])
+        self.assertEqual([c['count'] for c in clusters], [2, 1])
+        self.assertEqual(clusters[0]['price'], {'min': 400000.0, 'median': 600000.0, 'max': 800000.0})
+        self.assertIsNone(clusters[0]['id'])
+        self.assertIsNotNone(clusters[1]['id'])
+
+        response = self.client.get('/api/listings/clusters/', {'zoom': 2})
+        self.assertEqual([c['count'] for c in response.data['clusters']], [3])
+
+    def test_clusters_honor_filters(self):
+        response = self.client.get('/api/listings/clusters/', {'zoom': 12, 'price_max': 450000})
+        self.assertEqual(sorted(c['count'] for c in response.data['clusters']), [1])
+
+    def test_zoom_required(self):
+        self.assertEqual(self.client.get('/api/listings/clusters/').status_code, 400)
+        self.assertEqual(self.client.get('/api/listings/clusters/', {'zoom': 30}).status_code, 400)
+
+
+class HeatmapMetricsTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        for i, (lon, lat, price, sqft) in enumerate([
+            (-71.09, 42.31, 400000, 1000), (-71.09, 42.31, 600000, 2000), (-71.01, 42.39, 900000, None)
+        ]):
+            MlsHistory.objects.create(
+                listing_id=f'H{i}', list_price=price, sqft=sqft,
+                latitude=lat, longitude=lon, location=Point(lon, lat, srid=4326)
+            )
+        CurrentListing.refresh(concurrently=False)
+
+    def test_mean_price_per_cell(self):
+        response = self.client.get('/api/listings/metrics/', {'bbox': '-71.1,42.3,-71.0,42.4', 'resolution': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.data['cell_size'], 0.05)
+        columns = response.data['columns']
+        self.assertEqual(columns['count'], [2, 1])
+        self.assertEqual(columns['value'], [500000.0, 900000.0])
+        self.assertAlmostEqual(columns['longitude'][0], -71.075)
+        self.assertAlmostEqual(columns['latitude'][1], 42.375)
+
+    def test_price_per_sqft_and_extent(self):
+        response = self.client.get('/api/listings/metrics/', {'metric': 'price_per_sqft', 'resolution': 2})
+        self.assertEqual(response.data['columns']['count'], [2, 1])
+        self.assertEqual(response.data['columns']['value'][0], 350.0)
+        self.assertIsNone(response.data['columns']['value'][1])
+
+    def test_binary_encoding(self):
+        import numpy as np
+        response = self.client.get('/api/listings/metrics/', {'bbox': '-71.1,42.3,-71.0,42.4', 'resolution': 2, 'encoding': 'binary', 'metric': 'count'})
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        records = np.frombuffer(response.content, dtype='<f4').reshape(-1, 4)
+        self.assertEqual(records[:, 2].tolist(), [2.0, 1.0])
+        self.assertEqual(records[:, 3].tolist(), [2.0, 1.0])
+
+    def test_invalid_metric(self):
+        self.assertEqual(self.client.get('/api/listings/metrics/', {'metric': 'foo'}).status_code, 400)
+
+
+class CursorPaginationTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        from listings.pagination import ListingCursorPagination
+        from rankings.models import RankingScore
+        self.client = APIClient()
+        self.original_page_size = ListingCursorPagination.page_size
+        ListingCursorPagination.page_size = 2
+        # Duplicate scores and a NULL sqft exercise the id tiebreaker and NULL ordering
+        self.listings = []
+        for i, (price, sqft, score) in enumerate([
+            (500000, 1000, 5.0), (400000, 2000, 5.0), (300000, None, 1.0), (600000, 1500, 9.0), (450000, 1500, 5.0)
+        ]):
+            listing = MlsHistory.objects.create(listing_id=f'P{i}', list_price=price, sqft=sqft)
+            RankingScore.objects.filter(listing=listing).update(score=score)
+            self.listings.append(listing)
+        CurrentListing.refresh(concurrently=False)
+
+    def tearDown(self):
+        from listings.pagination import ListingCursorPagination
+        ListingCursorPagination.page_size = self.original_page_size
+
+    def walk(self, params):
+        ids, pages = [], []
+        response = self.client.get('/api/listings/', params)
+        while True:
+            pages.append(response.data)
+            ids += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_default_order(self):
+        ids, pages = self.walk({})
+        self.assertEqual(ids, [l.id for l in self.listings])
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['count'])
+
+    def test_ranking_sort(self):
+        ids, _ = self.walk({'sort': '-ranking_score'})
+        l = self.listings
+        self.assertEqual(ids, [l[3].id, l[4].id, l[1].id, l[0].id, l[2].id])
+
+    def test_custom_sort_with_nulls_last(self):
+        ids, _ = self.walk({'custom_sort': 'list_price/sqft', 'direction': 'asc'})
+        l = self.listings
+        self.assertEqual(ids, [l[1].id, l[4].id, l[3].id, l[0].id, l[2].id])
+
+    def test_custom_sort_with_decimal_values(self):
+        # numeric / integer is numeric in PostgreSQL, so the cursor value is a Decimal
+        for listing, year in zip(self.listings, [2000, 1990, 1980, 2010, 1995]):
+            MlsHistory.objects.filter(id=listing.id).update(year_built=year)
+        CurrentListing.refresh(concurrently=False)
+        ids, pages = self.walk({'custom_sort': 'list_price/year_built', 'direction': 'desc'})
+        l = self.listings
+        self.assertEqual(ids, [l[3].id, l[0].id, l[4].id, l[1].id, l[2].id])
+        self.assertEqual(len(pages), 3)
+
+    def test_previous_link(self):
+        _, pages = self.walk({'sort': 'ranking_score'})
+        response = self.client.get(pages[2]['previous'])
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [row['id'] for row in pages[1]['results']]
+        )
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(response.data['results'], pages[0]['results'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_new_rows_do_not_shift_pages(self):
+        first = self.client.get('/api/listings/').data
+        MlsHistory.objects.create(listing_id='P-new', list_price=1)
+        CurrentListing.refresh(concurrently=False)
+        second = self.client.get(first['next']).data
+        self.assertEqual([row['id'] for row in second['results']], [self.listings[2].id, self.listings[3].id])
+
+    def test_counts(self):
+        self.assertEqual(self.client.get('/api/listings/', {'count': 'exact'}).data['count'], 5)
+        self.assertIsInstance(self.client.get('/api/listings/', {'count': 'estimate'}).data['count'], int)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/listings/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class SparseFieldsetTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.listing = MlsHistory.objects.create(
+            listing_id='S1', list_price=500000, beds=3, text='A very long description', agent_email='agent@example.com'
+        )
+        CurrentListing.refresh(concurrently=False)
+
+    def test_list_is_compact_and_detail_is_full(self):
+        row = self.client.get('/api/listings/').data['results'][0]
+        self.assertNotIn('text', row)
+        self.assertNotIn('agent_email', row)
+        self.assertIn('ranking_score', row)
+
+        detail = self.client.get(f'/api/listings/{self.listing.id}/').data
+        self.assertEqual(detail['text'], 'A very long description')
+
+    def test_fields_and_omit(self):
+        row = self.client.get('/api/listings/', {'fields': 'list_price,beds'}).data['results'][0]
+        self.assertEqual(set(row), {'id', 'list_price', 'beds'})
+
+        row = self.client.get('/api/listings/', {'omit': 'primary_photo,ranking_score,id'}).data['results'][0]
+        self.assertNotIn('primary_photo', row)
+        self.assertNotIn('ranking_score', row)
+        self.assertIn('id', row)
+
+        detail = self.client.get(f'/api/listings/{self.listing.id}/', {'fields': 'text'}).data
+        self.assertEqual(set(detail), {'id', 'text'})
+
+    def test_select_is_narrowed(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/listings/', {'fields': 'list_price'})
+        select = queries.captured_queries[-1]['sql']
+        self.assertIn('"list_price"', select)
+        self.assertNotIn('"text"', select)
+
+
+class ConditionalGetTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.listing = MlsHistory.objects.create(listing_id='E1', list_price=500000)
+        CurrentListing.refresh(concurrently=False)
+
+    def test_not_modified_without_running_the_query(self):
+        response = self.client.get('/api/listings/', {'price_min': 1})
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/listings/', {'price_min': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_params(self):
+        first = self.client.get('/api/listings/', {'price_min': 1})['ETag']
+        self.assertNotEqual(first, self.client.get('/api/listings/', {'price_min': 2})['ETag'])
+
+    def test_etag_changes_after_ingest_and_rescore(self):
+        from rankings.models import RescoreJob
+        etag = self.client.get(f'/api/listings/{self.listing.id}/')['ETag']
+
+        CurrentListing.refresh(concurrently=False)
+        response = self.client.get(f'/api/listings/{self.listing.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        RescoreJob.objects.create(status=RescoreJob.DONE)
+        response = self.client.get(f'/api/listings/{self.listing.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_after_reset(self):
+        for path in ('/api/listings/', '/api/rankings/distribution/'):
+            etag = self.client.get(path)['ETag']
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            self.client.post('/api/rankings/reset/')
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_insights_follow_preferences(self):
+        from rankings.models import FeatureWeight
+        etag = self.client.get('/api/rankings/insights/')['ETag']
+        self.assertEqual(self.client.get('/api/rankings/insights/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        FeatureWeight.objects.create(feature_name='beds', weight=1.0)
+        self.assertEqual(self.client.get('/api/rankings/insights/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ResultCacheTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        MlsHistory.objects.create(
+            listing_id='Q1', list_price=500000, latitude=42.36, longitude=-71.06, location=Point(-71.06, 42.36, srid=4326)
+        )
+        CurrentListing.refresh(concurrently=False)
+
+    def stats(self):
+        return self.client.get('/api/listings/cache-stats/').data
+
+    def test_near_identical_bbox_hits(self):
+        first = self.client.get('/api/listings/', {'bbox': '-71.1,42.3,-71.0,42.4', 'price_min': 1})
+        with self.assertNumQueries(2):
+            second = self.client.get('/api/listings/', {'price_min': 1, 'bbox': '-71.100001,42.300002,-71.0,42.4'})
+        self.assertEqual(first.data, second.data)
+        self.assertEqual((self.stats()['hits'], self.stats()['misses']), (1, 1))
+
+    def test_polygon_canonical_form(self):
+        a = ListingResultCache.normalize_polygon('POLYGON((0 0, 1 0, 1 1, 0 0))')
+        b = ListingResultCache.normalize_polygon('POLYGON((1 0, 1 1, 0 0, 1 0))')
+        self.assertEqual(a, b)
+
+    def test_ingest_invalidates(self):
+        self.client.get('/api/listings/metrics/')
+        MlsHistory.objects.create(
+            listing_id='Q2', list_price=700000, latitude=42.37, longitude=-71.05, location=Point(-71.05, 42.37, srid=4326)
+        )
+        CurrentListing.refresh(concurrently=False)
+        response = self.client.get('/api/listings/metrics/', {'metric': 'count', 'resolution': 1})
+        self.assertEqual(sum(response.data['columns']['count']), 2)
+        self.assertEqual(self.stats()['hits'], 0)
+
+    def test_binary_responses_are_cached(self):
+        first = self.client.get('/api/listings/tiles/0/0/0.mvt')
+        second = self.client.get('/api/listings/tiles/0/0/0.mvt')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertEqual(self.stats()['hits'], 1)
+
+    def test_representations_are_keyed_by_format(self):
+        params = {'bbox': '-71.1,42.3,-71.0,42.4'}
+        geojson = self.client.get('/api/listings/', params, HTTP_ACCEPT='application/geo+json')
+        plain = self.client.get('/api/listings/', params)
+        self.assertEqual(geojson['Content-Type'], 'application/geo+json')
+        self.assertIn('results', plain.json())
+        self.assertNotEqual(geojson['ETag'], plain['ETag'])
+        self.assertIn('Accept', plain['Vary'])
+        self.assertEqual(self.stats()['hits'], 0)
+
+    def test_oversized_responses_are_not_cached(self):
+        from django.test import override_settings
+        with override_settings(LISTING_CACHE_MAX_ITEM_BYTES=10):
+            self.client.get('/api/listings/')
+            self.client.get('/api/listings/')
+        self.assertEqual(self.stats()['hits'], 0)
+
+
+class ExportTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        for i, price in enumerate([300000, 600000, 450000]):
+            MlsHistory.objects.create(
+                listing_id=f'E{i}', list_price=price, city='Boston', latitude=42.36, longitude=-71.06 + i * 0.01,
+                location=Point(-71.06 + i * 0.01, 42.36, srid=4326)
+            )
+        CurrentListing.refresh(concurrently=False)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_applies_filters_and_sort(self):
+        import json
+        response = self.client.get('/api/listings/export/', {
+            'price_min': 400000, 'custom_sort': 'list_price/sqft', 'sort': '-ranking_score', 'fields': 'list_price'
+        })
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertCountEqual([row['list_price'] for row in rows], [600000, 450000])
+        self.assertEqual(set(rows[0]), {'id', 'list_price'})
+
+    def test_csv_header_and_rows(self):
+        import csv
+        response = self.client.get('/api/listings/export/', {'format': 'csv', 'fields': 'city,list_price'})
+        rows = list(csv.reader(self.read(response).splitlines()))
+        self.assertEqual(rows[0], ['id', 'city', 'list_price'])
+        self.assertEqual(len(rows), 4)
+
+    def test_geojson_feature_collection(self):
+        import json
+        response = self.client.get('/api/listings/export/', {'format': 'geojson', 'omit': 'formatted_address'})
+        collection = json.loads(self.read(response))
+        self.assertEqual(len(collection['features']), 3)
+        feature = collection['features'][0]
+        self.assertEqual(feature['geometry']['type'], 'Point')
+        self.assertNotIn('location', feature['properties'])
+        self.assertIn('ranking_score', feature['properties'])
+
+    def test_command_writes_file(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'listings.ndjson')
+            call_command('export_listings', path, param=['price_max=400000'], stderr=StringIO())
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 1)
+
+
+class GeoJsonFastTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        for i, price in enumerate([300000, 600000, 450000]):
+            MlsHistory.objects.create(
+                listing_id=f'G{i}', list_price=price, sqft=1000 + i, latitude=42.36, longitude=-71.06 + i * 0.01,
+                location=Point(-71.06 + i * 0.01, 42.36, srid=4326)
+            )
+        CurrentListing.refresh(concurrently=False)
+
+    def test_matches_serialized_list(self):
+        import json
+        params = {'price_min': 400000, 'custom_sort': 'list_price/sqft', 'direction': 'desc'}
+        listed = self.client.get('/api/listings/', params).data['results']
+        response = self.client.get('/api/listings/', {**params, 'format': 'geojson-fast'})
+
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        collection = json.loads(response.content)
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual([f['properties']['id'] for f in collection['features']], [row['id'] for row in listed])
+        feature = collection['features'][0]
+        self.assertEqual(feature['geometry'], {'type': 'Point', 'coordinates': [-71.05, 42.36]})
+        # Same values as the serializer: decimals as strings, DRF's timestamp format
+        for feature, row in zip(collection['features'], listed):
+            self.assertEqual(feature['properties'], dict(row))
+
+    def test_capped_at_page_size(self):
+        import json
+        from listings.pagination import ListingCursorPagination
+        original = ListingCursorPagination.page_size
+        ListingCursorPagination.page_size = 2
+        try:
+            listed = self.client.get('/api/listings/', {'sort': '-ranking_score'}).data['results']
+            response = self.client.get('/api/listings/', {'sort': '-ranking_score', 'format': 'geojson-fast'})
+        finally:
+            ListingCursorPagination.page_size = original
+        features = json.loads(response.content)['features']
+        self.assertEqual([f['properties']['id'] for f in features], [row['id'] for row in listed])
+        self.assertEqual(len(features), 2)
+
+    def test_sparse_fields_and_empty_result(self):
+        import json
+        response = self.client.get('/api/listings/', {'format': 'geojson-fast', 'fields': 'list_price'})
+        properties = json.loads(response.content)['features'][0]['properties']
+        self.assertEqual(set(properties), {'id', 'list_price'})
+
+        response = self.client.get('/api/listings/', {'format': 'geojson-fast', 'price_min': 10 ** 9})
+        self.assertEqual(json.loads(response.content)['features'], [])
+
+    def test_benchmark_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('benchmark_listing_serialization', listings=20, repeat=1, stdout=out)
+        self.assertIn('geojson-fast', out.getvalue())
+        self.assertEqual(MlsHistory.objects.count(), 3)
+
+
+class ORJSONRendererTests(TestCase):
+    def test_matches_stdlib_renderer(self):
+        import json
+        from decimal import Decimal
+        from django.utils import timezone
+        from rest_framework.renderers import JSONRenderer
+        from haus_config.renderers import ORJSONRenderer
+        data = {
+            'price': Decimal('512500.50'), 'when': timezone.now().replace(microsecond=0),
+            'nested': [{'id': 1, 'tax': Decimal('10')}], 7: 'int key',
+        }
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_geometry(self):
+        import json
+        from haus_config.renderers import ORJSONRenderer
+        rendered = json.loads(ORJSONRenderer().render({'location': Point(-71.06, 42.36, srid=4326)}))
+        self.assertEqual(rendered['location'], {'type': 'Point', 'coordinates': [-71.06, 42.36]})
+
+    def test_parser_errors_are_bad_requests(self):
+        response = APIClient().post('/api/comparisons/batch/', data='{not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class NearSearchTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        # ~0 m, ~820 m and ~2.5 km east of the search point
+        for i, (offset, price) in enumerate([(0.0, 300000), (0.01, 600000), (0.03, 450000)]):
+            MlsHistory.objects.create(
+                listing_id=f'N{i}', list_price=price, latitude=42.36, longitude=-71.06 + offset,
+                location=Point(-71.06 + offset, 42.36, srid=4326)
+            )
+        CurrentListing.refresh(concurrently=False)
+
+    def test_radius_orders_by_distance(self):
+        results = self.client.get('/api/listings/', {'near': '-71.06,42.36', 'radius_m': 1000}).data['results']
+        self.assertEqual([row['listing_id'] for row in results], ['N0', 'N1'])
+        self.assertAlmostEqual(results[0]['distance'], 0.0)
+        self.assertAlmostEqual(results[1]['distance'], 822, delta=5)
+
+    def test_nearest_k_after_filters(self):
+        results = self.client.get('/api/listings/', {'near': '-71.06,42.36', 'k': 1, 'price_min': 400000}).data['results']
+        self.assertEqual([row['listing_id'] for row in results], ['N1'])
+
+    def test_distance_only_with_near(self):
+        row = self.client.get('/api/listings/').data['results'][0]
+        self.assertNotIn('distance', row)
+
+    def test_invalid_near_is_ignored(self):
+        response = self.client.get('/api/listings/', {'near': '500,42', 'radius_m': 10})
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class SimilarityTests(ListingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        from listings.similarity import ListingSimilarity
+        ListingSimilarity.invalidate()
+        self.client = APIClient()
+        specs = [
+            ('S0', 3, 2, 1500, 500000, 0.0),
+            ('S1', 3, 2, 1550, 520000, 0.002),
+            ('S2', 6, 5, 5200, 2400000, 0.004),
+            ('S3', 3, 2, 1500, 510000, 0.05),
+        ]
+        self.ids = {}
+        for listing_id, beds, baths, sqft, price, offset in specs:
+            self.ids[listing_id] = MlsHistory.objects.create(
+                listing_id=listing_id, beds=beds, full_baths=baths, sqft=sqft, list_price=price, year_built=1990,
+                latitude=42.36, longitude=-71.06 + offset, location=Point(-71.06 + offset, 42.36, srid=4326)
+            ).id
+        CurrentListing.refresh(concurrently=False)
+
+    def similar(self, **params):
+        response = self.client.get(f"/api/listings/{self.ids['S0']}/similar/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row['listing_id'] for row in response.data]
+
+    def test_most_alike_first(self):
+        self.assertEqual(self.similar()[0], 'S1')
+        self.assertEqual(self.similar()[-1], 'S2')
+        self.assertNotIn('S0', self.similar())
+
+    def test_constraints(self):
+        self.assertEqual(self.similar(radius_m=1000), ['S1', 'S2'])
+        self.assertEqual(self.similar(price_max=1000000, k=1), ['S1'])
+        response = self.client.get(f"/api/listings/{self.ids['S0']}/similar/", {'k': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuilt_after_ingest(self):
+        self.similar()
+        MlsHistory.objects.create(
+            listing_id='S4', beds=3, full_baths=2, sqft=1500, list_price=500000, year_built=1990,
+            latitude=42.36, longitude=-71.06, location=Point(-71.06, 42.36, srid=4326)
+        )
+        CurrentListing.refresh(concurrently=False)
+        self.assertEqual(self.similar()[0], 'S4')
+
+    def test_candidates_ordered_by_similarity(self):
+        response = self.client.post('/api/candidates/', {'seed_id': self.ids['S0']}, format='json')
+        self.assertEqual([row['listing_id'] for row in response.data], ['S1'])
+        # S3 is ~4 km away, S2 over twice the price
+        response = self.client.post('/api/candidates/', {'seed_id': self.ids['S0'], 'radius_m': 10000}, format='json')
+        self.assertEqual([row['listing_id'] for row in response.data], ['S1', 'S3'])
+        self.assertLess(response.data[0]['similarity_distance'], response.data[1]['similarity_distance'])
@@ -0,0 +1,61 @@
+import math
+from django.contrib.gis.geos import Polygon
+from django.db import connection
+
+# Highest zoom level served; deeper tiles would hold a single listing at most
+MAX_ZOOM = 22
+# Tile coordinate space of ST_AsMVTGeom
+EXTENT = 4096
+LAYER_NAME = 'listings'
+CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z, x, y):
+    """
+    WGS84 bounding box (min_lon, min_lat, max_lon, max_lat) of an XYZ web mercator tile.
+    """
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y))
+
+
+def render_tile(qs, z, x, y):
+    """
+    Encodes the listings of `qs` that fall in tile z/x/y as a Mapbox Vector Tile.
+
+    Each feature carries only what the map styles on: id, price, beds and
+    ranking score. `qs` must carry the ranking_score annotation
+    (see serializers.with_ranking_score). The tile's bounding box is applied
+    as an ORM filter, so the GiST index on location prunes the rows.
+    """
+    envelope = Polygon.from_bbox(tile_bounds(z, x, y))
+    envelope.srid = 4326
+    rows = qs.filter(location__bboverlaps=envelope).order_by().values(
+        'id', 'location', 'list_price', 'beds', 'ranking_score'
+    )
+    rows_sql, rows_params = rows.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom),
+            features AS (
+                SELECT ST_AsMVTGeom(ST_Transform(l.location, 3857), bounds.geom, %s) AS geom,
+                       l.id,
+                       l.list_price::float8 AS price,
+                       l.beds,
+                       l.ranking_score AS score
+                FROM ({rows_sql}) l CROSS JOIN bounds
+                WHERE l.location IS NOT NULL
+            )
+            SELECT ST_AsMVT(features.*, %s, %s, 'geom') FROM features
+        """, [z, x, y, EXTENT] + list(rows_params) + [LAYER_NAME, EXTENT])
+        tile = cursor.fetchone()[0]
+
+    return bytes(tile) if tile is not None else b''
@@ -1,46 +1,51 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.contrib.gis.geos import Polygon, GEOSGeometry
+from rest_framework.settings import api_settings
+from django.http import HttpResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django.db.models import F, ExpressionWrapper, FloatField
 from .models import CurrentListing, MlsHistory
-from .serializers import ListingSerializer, MlsHistorySerializer
-from .filters import ListingFilter
+from .serializers import ListingSerializer, ListingListSerializer, MlsHistorySerializer, SparseFieldsetMixin, with_ranking_score
+from .filters import ListingFilter, apply_nearest, apply_spatial_filters
+from .tiles import CONTENT_TYPE as TILE_CONTENT_TYPE, MAX_ZOOM, render_tile, valid_tile
+from .pagination import ListingCursorPagination
+from .aggregates import (
+    DEFAULT_HEAT_RESOLUTION, HEAT_METRICS, MAX_HEAT_RESOLUTION, cell_size, cluster_cells, heat_bounds, heat_cells
+)
+from rankings.versions import conditional_get
+from .result_cache import ListingResultCache, cached_result
+from .similarity import ListingSimilarity
+from .export import EXPORT_RENDERERS, EXPORTERS, export_columns, parquet_available
+from .geojson import CONTENT_TYPE as GEOJSON_CONTENT_TYPE, GeoJsonFastRenderer, feature_collection
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Listing rows change with each scrape and carry the current ranking score
+listing_versions = conditional_get('ingest', 'scores')
+
+
+@method_decorator([listing_versions, cached_result], name='list')
+@method_decorator(listing_versions, name='retrieve')
 class ListingsViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = CurrentListing.objects.all()
     serializer_class = ListingSerializer
     filterset_class = ListingFilter
+    pagination_class = ListingCursorPagination
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [GeoJsonFastRenderer]
     # filterset_fields removed in favor of class
+    # Seconds browsers may reuse a vector tile
+    TILE_MAX_AGE = 60
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        
-        # Polygon Filtering
-        polygon_wkt = self.request.query_params.get('polygon', None)
-        if polygon_wkt:
-            try:
-                # Expecting WKT POLYGON((...))
-                poly = GEOSGeometry(polygon_wkt)
-                qs = qs.filter(location__within=poly)
-            except Exception as e:
-                logger.error(f"Invalid polygon WKT: {e}")
-                pass
-        
-        # Bounding Box Filtering ?bbox=min_lon,min_lat,max_lon,max_lat
-        bbox = self.request.query_params.get('bbox', None)
-        if bbox:
-            try:
-                bbox_vals = [float(x) for x in bbox.split(',')]
-                if len(bbox_vals) == 4:
-                    bbox_poly = Polygon.from_bbox(bbox_vals)
-                    qs = qs.filter(location__within=bbox_poly)
-            except Exception as e:
-                logger.error(f"Invalid bbox: {e}")
-                pass
+        # The score is serialized on every row; fetch it with the listings.
+        # The first ordering term below is the key ListingCursorPagination pages on
+        qs = with_ranking_score(super().get_queryset()).order_by('id')
+
+        qs = apply_spatial_filters(qs, self.request.query_params)
 
         # Arithmetic / Custom Sorting
         # Example: ?custom_sort=list_price/sqft&direction=asc
@@ -65,40 +70,175 @@ class ListingsViewSet(viewsets.ReadOnlyModelViewSet):
                 logger.error(f"Error parsing custom sort: {e}")
                 pass
         
-        # Ranking Sorting
+        # Ranking Sorting (listings without a score sort as DEFAULT_RANKING_SCORE)
         sort = self.request.query_params.get('sort', None)
         if sort in ['ranking_score', '-ranking_score']:
-            from rankings.models import RankingScore
-            from django.db.models import OuterRef, Subquery
-            
-            # Subquery to get the score
-            score_subquery = RankingScore.objects.filter(listing_id=OuterRef('pk')).values('score')[:1]
-            qs = qs.annotate(annotated_ranking_score=Subquery(score_subquery))
-            
-            # Use Coalesce to handle listings without a score, defaulting to 1000.0
-            from django.db.models.functions import Coalesce
-            from django.db.models import Value
-            qs = qs.annotate(
-                final_ranking_score=Coalesce(F('annotated_ranking_score'), Value(1000.0))
-            )
-            
-            order_by = 'final_ranking_score' if sort == 'ranking_score' else '-final_ranking_score'
-            qs = qs.order_by(order_by)
+            qs = qs.order_by(sort)
+
+        # Only SELECT the columns the serializer will output
+        if self.action in ('list', 'retrieve'):
+            qs = qs.only(*self.get_serialized_columns())
 
         return qs
 
+    def filter_queryset(self, queryset):
+        # ?near=&k= keeps the k closest listings among those matching every other filter
+        return apply_nearest(super().filter_queryset(queryset), self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == GeoJsonFastRenderer.format:
+            # Map views: the first page of the paginated path as a FeatureCollection, rendered by PostgreSQL
+            fields = SparseFieldsetMixin.requested_fields(request.query_params, ListingListSerializer().fields)
+            qs = self.filter_queryset(self.get_queryset())
+            field, descending = self.paginator.sort_key(qs)
+            qs = self.paginator.order(qs, field, descending, nulls_first=False)
+            collection = feature_collection(qs, fields, limit=self.paginator.page_size)
+            return HttpResponse(collection, content_type=GEOJSON_CONTENT_TYPE)
+        return super().list(request, *args, **kwargs)
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ListingListSerializer
+        return super().get_serializer_class()
+
+    def get_serialized_columns(self):
+        """
+        Model columns behind the fields the serializer will output for this request.
+        """
+        serializer_class = self.get_serializer_class()
+        fields = SparseFieldsetMixin.requested_fields(self.request.query_params, serializer_class().fields)
+        return [f.name for f in CurrentListing._meta.concrete_fields if f.name in fields]
+
     @action(detail=False, methods=['get'])
+    @method_decorator([listing_versions, cached_result])
     def metrics(self, request):
         """
-        Return aggregated metrics for the current view (heatmap data).
+        Heatmap for the current view, binned in SQL: ?metric=price|price_per_sqft|score|count,
+        ?resolution= cells across the bbox (or the filtered listings' extent),
+        ?encoding=json (columnar) or binary (little-endian float32 lon, lat, count, value records).
         """
+        metric = request.query_params.get('metric', 'price')
+        if metric not in HEAT_METRICS:
+            return Response({"error": f"metric must be one of {', '.join(HEAT_METRICS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            resolution = int(request.query_params.get('resolution', DEFAULT_HEAT_RESOLUTION))
+        except ValueError:
+            return Response({"error": "resolution must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= resolution <= MAX_HEAT_RESOLUTION:
+            return Response({"error": f"resolution must be between 1 and {MAX_HEAT_RESOLUTION}"}, status=status.HTTP_400_BAD_REQUEST)
+
         qs = self.filter_queryset(self.get_queryset())
-        # For simple heatmap: return lat, lon, weight (e.g. price per sqft or price)
-        # Limit to reasonable number
-        data = qs.values('latitude', 'longitude', 'list_price', 'sqft')[:2000]
-        return Response(list(data))
+        try:
+            bounds = [float(v) for v in request.query_params['bbox'].split(',')]
+            if len(bounds) != 4:
+                raise ValueError
+        except (KeyError, ValueError):
+            bounds = heat_bounds(qs)
+
+        size, columns = heat_cells(qs, metric, bounds, resolution) if bounds else (None, {
+            "longitude": [], "latitude": [], "count": [], "value": []
+        })
+
+        if request.query_params.get('encoding') == 'binary':
+            records = np.array(
+                [columns['longitude'], columns['latitude'], columns['count'],
+                 [np.nan if v is None else v for v in columns['value']]],
+                dtype='<f4'
+            ).T
+            response = HttpResponse(records.tobytes(), content_type='application/octet-stream')
+            response['X-Heatmap-Metric'] = metric
+            response['X-Heatmap-Cell-Size'] = repr(size)
+            return response
+
+        return Response({"metric": metric, "cell_size": size, "columns": columns})
+
+    @action(detail=False, methods=['get'])
+    @method_decorator([listing_versions, cached_result])
+    def clusters(self, request):
+        """
+        Marker clusters for the current view: ?zoom= plus the usual filters (normally bbox).
+        """
+        try:
+            zoom = int(request.query_params['zoom'])
+        except (KeyError, ValueError):
+            return Response({"error": "zoom must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= zoom <= MAX_ZOOM:
+            return Response({"error": f"zoom must be between 0 and {MAX_ZOOM}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        qs = self.filter_queryset(self.get_queryset())
+        return Response({
+            "zoom": zoom,
+            "cell_size": cell_size(zoom),
+            "clusters": cluster_cells(qs, zoom)
+        })
+
+    # Routed explicitly in urls.py as /api/listings/tiles/{z}/{x}/{y}.mvt
+    @method_decorator([listing_versions, cached_result])
+    def tiles(self, request, z, x, y):
+        """
+        Mapbox Vector Tile of the filtered listings in tile z/x/y.
+        """
+        if not valid_tile(z, x, y):
+            raise Http404("Tile out of range")
+
+        qs = self.filter_queryset(self.get_queryset())
+        response = HttpResponse(render_tile(qs, z, x, y), content_type=TILE_CONTENT_TYPE)
+        response['Cache-Control'] = f'public, max-age={self.TILE_MAX_AGE}'
+        return response
+
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    @method_decorator(listing_versions)
+    def export(self, request):
+        """
+        Streams every listing matching the filters and sort, unpaginated:
+        ?format=ndjson (default), csv, geojson or parquet, plus fields/omit.
+        """
+        renderer = request.accepted_renderer
+        if renderer.format == 'parquet' and not parquet_available():
+            return JsonResponse({"error": "Parquet export requires pyarrow"}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = SparseFieldsetMixin.requested_fields(request.query_params, ListingSerializer().fields)
+        qs = self.filter_queryset(self.get_queryset())
+        columns = export_columns(qs, fields)
+
+        response = StreamingHttpResponse(EXPORTERS[renderer.format](qs, columns), content_type=renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="listings.{renderer.extension}"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """
+        Hit/miss counters of the listing result cache, for monitoring.
+        """
+        return Response(ListingResultCache.stats())
+
+    @action(detail=True, methods=['get'])
+    @method_decorator(listing_versions)
+    def similar(self, request, pk=None):
+        """
+        "More like this": the current listings most similar to this one, most alike first.
+        ?k= (default 50), ?radius_m=, ?price_min=, ?price_max= narrow the search.
+        """
+        try:
+            options = ListingSimilarity.query_options(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The seed is looked up unfiltered: price_min/price_max limit the matches, not the seed
+        seed = get_object_or_404(CurrentListing, pk=pk)
+        matches = ListingSimilarity.similar(seed, **options)
+        listings = with_ranking_score(CurrentListing.objects.all()).in_bulk([i for i, _ in matches])
+        rows = []
+        for match_id, distance in matches:
+            if match_id in listings:
+                listings[match_id].similarity_distance = distance
+                rows.append(listings[match_id])
+
+        serializer = ListingListSerializer(rows, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
+    @method_decorator(conditional_get('ingest'))
     def history(self, request, pk=None):
         """
         Return the full history for a specific listing using listing_id.
@@ -0,0 +1,144 @@
+import math
+import numpy as np
+from listings.models import MlsHistory
+from .models import RankingScore
+
+
+class BatchScorer:
+    """
+    Vectorized scoring engine used by FeatureRanker.recompute_all_scores.
+
+    Every term of FeatureRanker.get_score is evaluated as an array operation
+    over all snapshots at once, in the same order, so the results match the
+    per-listing scores bit for bit.
+    """
+    # Upper bound on listings x hotspots elements materialized at once
+    DISTANCE_CHUNK_ELEMENTS = 1 << 20
+    UPSERT_BATCH_SIZE = 5000
+
+    @classmethod
+    def load_features(cls, queryset=None):
+        """
+        Loads the scoring columns of every listing into NumPy arrays in a single query.
+        """
+        from .feature_ranker import FeatureRanker
+
+        if queryset is None:
+            queryset = MlsHistory.objects.all()
+
+        columns = ['id'] + FeatureRanker.NUMERIC_FEATURES + ['list_price', 'latitude', 'longitude', 'neighborhoods']
+        rows = list(queryset.values_list(*columns))
+        values = dict(zip(columns, zip(*rows))) if rows else {c: () for c in columns}
+        count = len(rows)
+
+        features = {
+            'id': np.fromiter(values['id'], dtype=np.int64, count=count),
+        }
+        # Same coercion rules as FeatureRanker.get_feature_vector
+        for f in FeatureRanker.NUMERIC_FEATURES:
+            features[f] = np.array([float(v) if v is not None else 0.0 for v in values[f]], dtype=np.float64)
+        features['list_price'] = np.array([float(v) if v else 0.0 for v in values['list_price']], dtype=np.float64)
+
+        # Hotspot distance only applies when both coordinates are truthy
+        features['has_location'] = np.array(
+            [bool(lat and lon) for lat, lon in zip(values['latitude'], values['longitude'])], dtype=bool
+        )
+        features['latitude'] = np.array([lat or 0.0 for lat in values['latitude']], dtype=np.float64)
+        features['longitude'] = np.array([lon or 0.0 for lon in values['longitude']], dtype=np.float64)
+
+        # Neighborhood names become integer codes; -1 marks "no neighborhood"
+        names = {}
+        features['neighborhood_code'] = np.array(
+            [names.setdefault(n, len(names)) if n else -1 for n in values['neighborhoods']], dtype=np.int64
+        )
+        features['neighborhood_names'] = list(names)
+
+        return features
+
+    @classmethod
+    def nearest_hotspot_distance(cls, latitude, longitude, hotspots):
+        """
+        Euclidean distance (in degrees) from each point to its nearest hotspot.
+        hotspots: array of shape (n, 2) holding (latitude, longitude) rows.
+        """
+        min_sq = np.empty(len(latitude), dtype=np.float64)
+        step = max(1, cls.DISTANCE_CHUNK_ELEMENTS // len(hotspots))
+        for start in range(0, len(latitude), step):
+            stop = start + step
+            dlat = latitude[start:stop, None] - hotspots[None, :, 0]
+            dlon = longitude[start:stop, None] - hotspots[None, :, 1]
+            min_sq[start:stop] = (dlat * dlat + dlon * dlon).min(axis=1)
+        # sqrt is monotonic, so the root of the minimum equals the minimum of the roots
+        return np.sqrt(min_sq)
+
+    @classmethod
+    def score(cls, features, preferences):
+        """
+        Scores every listing in `features` against a PreferenceModel.
+        Returns (scores, hotspot_distance) arrays
+        aligned with features['id']; the distance is NaN where no hotspot term applies.
+        """
+        from .feature_ranker import FeatureRanker
+
+        weights = preferences.weights
+        scores = np.zeros(len(features['id']), dtype=np.float64)
+
+        # Numeric features
+        for f in FeatureRanker.NUMERIC_FEATURES:
+            scores += features[f] * weights.get(f, 0.0)
+
+        # Budget logic
+        budget_cap = preferences.budget_cap
+        if budget_cap:
+            over = features['list_price'] > budget_cap
+            excess = (features['list_price'][over] - budget_cap) / budget_cap
+            scores[over] -= (excess * excess) * preferences.penalty_weight * 1000
+
+        # Neighborhood bonus; the trailing 0.0 is picked up by code -1
+        neighborhood_weights = preferences.neighborhood_weights
+        bonus = np.array(
+            [neighborhood_weights.get(name, 0.0) for name in features['neighborhood_names']] + [0.0],
+            dtype=np.float64,
+        )
+        scores += bonus[features['neighborhood_code']]
+
+        # Distance to hotspots
+        hotspots = preferences.hotspots
+        located = features['has_location']
+        distances = np.full(len(scores), np.nan, dtype=np.float64)
+        if hotspots and located.any():
+            spots = np.array([(spot.latitude, spot.longitude) for spot in hotspots], dtype=np.float64)
+            min_dist = cls.nearest_hotspot_distance(features['latitude'][located], features['longitude'][located], spots)
+            scores[located] += min_dist * preferences.dist_weight
+            distances[located] = min_dist
+
+        return scores, distances
+
+    @classmethod
+    def write_scores(cls, ids, scores, distances):
+        """
+        Upserts one RankingScore per listing in batched INSERT ... ON CONFLICT statements.
+        """
+        RankingScore.objects.bulk_create(
+            [
+                RankingScore(listing_id=i, score=s, hotspot_distance=None if math.isnan(d) else d)
+                for i, s, d in zip(ids.tolist(), scores.tolist(), distances.tolist())
+            ],
+            batch_size=cls.UPSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['listing'],
+            update_fields=['score', 'hotspot_distance', 'last_updated'],
+        )
+
+    @classmethod
+    def recompute(cls, preferences, queryset=None):
+        """
+        Scores and persists every listing in `queryset` (all snapshots by default).
+        Returns the number of listings scored.
+        """
+        features = cls.load_features(queryset)
+        if not len(features['id']):
+            return 0
+        scores, distances = cls.score(features, preferences)
+        cls.write_scores(features['id'], scores, distances)
+        return len(scores)
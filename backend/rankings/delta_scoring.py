@@ -0,0 +1,196 @@
+from django.db import connection
+from django.db.models import Q
+from listings.models import MlsHistory
+from .batch_scoring import BatchScorer
+
+
+class DeltaScorer:
+    """
+    Incremental rescoring between two preference snapshots.
+
+    The score is linear in the feature and neighborhood weights, so a change
+    of weights is applied as Δw·x directly on the stored scores. The budget
+    penalty is re-evaluated only for listings priced above the lower of the
+    two caps, neighborhood deltas only touch listings in those neighborhoods,
+    and a new hotspot only touches listings it is now the nearest hotspot for,
+    found through the GiST index on the listing coordinates.
+
+    Listings are append-only, so anything newer than the snapshot (or
+    without a score row) is scored in full instead.
+
+    Stored scores accumulate floating point rounding across deltas; a full
+    rescore (FeatureRanker.recompute_all_scores) resets them exactly.
+    """
+    LOCATION_SQL = "ST_SetSRID(ST_MakePoint(l.longitude, l.latitude), 4326)"
+
+    @classmethod
+    def snapshot(cls, preferences, listing_max_id):
+        """
+        JSON-serializable summary of a PreferenceModel, stored on the RescoreJob
+        that applied it to every listing up to `listing_max_id`. Hotspots are
+        append-only between compactions, so only their count and highest id are recorded.
+        """
+        hotspot_ids = [spot.id for spot in preferences.hotspots]
+        return {
+            'weights': preferences.weights,
+            'budget_cap': preferences.budget_cap,
+            'penalty_weight': preferences.penalty_weight,
+            'neighborhood_weights': preferences.neighborhood_weights,
+            'dist_weight': preferences.dist_weight,
+            'hotspot_count': len(hotspot_ids),
+            'hotspot_max_id': max(hotspot_ids, default=0),
+            'listing_max_id': listing_max_id,
+        }
+
+    @classmethod
+    def can_apply(cls, base, preferences):
+        """
+        A delta is possible when the stored scores have a known snapshot and no
+        hotspot that existed at that snapshot has since been removed.
+        """
+        if not base:
+            return False
+        kept = [spot for spot in preferences.hotspots if spot.id <= base['hotspot_max_id']]
+        return len(kept) == base['hotspot_count']
+
+    @classmethod
+    def _penalty_sql(cls, budget_cap, penalty_weight):
+        """
+        SQL for the budget penalty term of FeatureRanker.get_score under the given cap.
+        """
+        if not budget_cap:
+            return "0.0", []
+        price_sql = "COALESCE(l.list_price, 0)::float8"
+        excess_sql = f"(({price_sql} - %s::float8) / %s::float8)"
+        sql = (
+            f"CASE WHEN {price_sql} > %s::float8 "
+            f"THEN ({excess_sql} * {excess_sql}) * %s::float8 * 1000 ELSE 0.0 END"
+        )
+        return sql, [budget_cap] * 5 + [penalty_weight]
+
+    @classmethod
+    def apply_weights(cls, cursor, base, preferences):
+        """
+        Applies numeric weight, budget and hotspot-weight changes in one UPDATE.
+        """
+        from .feature_ranker import FeatureRanker
+
+        terms, params = [], []
+        where, where_params = ["rs.listing_id <= %s"], [base['listing_max_id']]
+
+        weights, base_weights = preferences.weights, base['weights']
+        for f in FeatureRanker.NUMERIC_FEATURES:
+            delta = weights.get(f, 0.0) - base_weights.get(f, 0.0)
+            if delta:
+                terms.append(f"COALESCE(l.{f}, 0)::float8 * %s::float8")
+                params.append(delta)
+        linear_changed = bool(terms)
+
+        caps = [cap for cap in (base['budget_cap'], preferences.budget_cap) if cap]
+        budget_changed = caps and (
+            (base['budget_cap'], base['penalty_weight']) != (preferences.budget_cap, preferences.penalty_weight)
+        )
+        if budget_changed:
+            old_sql, old_params = cls._penalty_sql(base['budget_cap'], base['penalty_weight'])
+            new_sql, new_params = cls._penalty_sql(preferences.budget_cap, preferences.penalty_weight)
+            terms.append(f"({old_sql}) - ({new_sql})")
+            params += old_params + new_params
+
+        dist_delta = preferences.dist_weight - base['dist_weight']
+        if dist_delta:
+            terms.append("COALESCE(rs.hotspot_distance, 0.0) * %s::float8")
+            params.append(dist_delta)
+
+        if not terms:
+            return 0
+
+        # The penalty can only differ for listings above the lower cap
+        if not linear_changed and not dist_delta:
+            where.append("COALESCE(l.list_price, 0)::float8 > %s::float8")
+            where_params.append(min(caps))
+
+        sql = f"""
+            UPDATE rankings_rankingscore rs
+            SET score = rs.score + {' + '.join(terms)}
+            FROM listings_mlshistory l
+            WHERE rs.listing_id = l.id {''.join(' AND ' + w for w in where)}
+        """
+        cursor.execute(sql, params + where_params)
+        return cursor.rowcount
+
+    @classmethod
+    def apply_neighborhoods(cls, cursor, base, preferences):
+        """
+        Adds each changed neighborhood weight to the listings in that neighborhood.
+        """
+        names = set(base['neighborhood_weights']) | set(preferences.neighborhood_weights)
+        deltas = {}
+        for name in names:
+            delta = preferences.neighborhood_weights.get(name, 0.0) - base['neighborhood_weights'].get(name, 0.0)
+            if delta:
+                deltas[name] = delta
+        if not deltas:
+            return 0
+
+        cursor.execute("""
+            UPDATE rankings_rankingscore rs
+            SET score = rs.score + d.delta
+            FROM listings_mlshistory l
+            JOIN unnest(%s::text[], %s::float8[]) AS d (name, delta) ON d.name = l.neighborhoods
+            WHERE rs.listing_id = l.id AND rs.listing_id <= %s
+        """, [list(deltas), list(deltas.values()), base['listing_max_id']])
+        return cursor.rowcount
+
+    @classmethod
+    def apply_hotspot(cls, cursor, spot, dist_weight, listing_max_id):
+        """
+        Moves the hotspot term of every listing for which `spot` is now the nearest hotspot.
+        """
+        # A listing only moves if `spot` is closer than its current nearest hotspot, which is
+        # at most the largest stored distance away; that bounds the index search
+        # (NULL means there were no hotspots yet and every located listing moves)
+        cursor.execute("SELECT max(hotspot_distance) FROM rankings_rankingscore")
+        radius = cursor.fetchone()[0]
+
+        spot_sql = "ST_SetSRID(ST_MakePoint(%s, %s), 4326)"
+        params = [spot.latitude, spot.latitude, spot.longitude, spot.longitude]
+        within_sql = ""
+        if radius is not None:
+            within_sql = f"AND ST_DWithin({cls.LOCATION_SQL}, {spot_sql}, %s)"
+            params += [spot.longitude, spot.latitude, radius]
+
+        cursor.execute(f"""
+            UPDATE rankings_rankingscore rs
+            SET score = rs.score + (d.dist * %s::float8 - COALESCE(rs.hotspot_distance * %s::float8, 0.0)),
+                hotspot_distance = d.dist
+            FROM (
+                SELECT l.id, sqrt(
+                    (l.latitude - %s) * (l.latitude - %s)
+                    + (l.longitude - %s) * (l.longitude - %s)
+                ) AS dist
+                FROM listings_mlshistory l
+                WHERE l.latitude <> 0 AND l.longitude <> 0 {within_sql}
+            ) d
+            WHERE rs.listing_id = d.id AND rs.listing_id <= %s
+              AND (rs.hotspot_distance IS NULL OR d.dist < rs.hotspot_distance)
+        """, [dist_weight, dist_weight] + params + [listing_max_id])
+        return cursor.rowcount
+
+    @classmethod
+    def apply(cls, base, preferences):
+        """
+        Brings stored scores from the `base` snapshot to `preferences`.
+        Returns the number of row updates performed.
+        """
+        max_id = base['listing_max_id']
+        touched = 0
+        with connection.cursor() as cursor:
+            touched += cls.apply_weights(cursor, base, preferences)
+            touched += cls.apply_neighborhoods(cursor, base, preferences)
+            for spot in preferences.hotspots:
+                if spot.id > base['hotspot_max_id']:
+                    touched += cls.apply_hotspot(cursor, spot, preferences.dist_weight, max_id)
+
+        unscored = MlsHistory.objects.filter(Q(id__gt=max_id) | Q(ranking_scores__isnull=True))
+        touched += BatchScorer.recompute(preferences, queryset=unscored)
+        return touched
@@ -1,5 +1,8 @@
 import math
-from .models import FeatureWeight, NeighborhoodWeight, LearnedPreference, FavoriteLocation, RankingScore
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from .models import FeatureWeight, NeighborhoodWeight, LearnedPreference, FavoriteLocation
+from .preference_model import PreferenceModel
 
 class FeatureRanker:
     NUMERIC_FEATURES = ['beds', 'full_baths', 'sqft', 'year_built', 'lot_sqft', 'parking_garage']
@@ -27,89 +30,85 @@ class FeatureRanker:
         return features
 
     @classmethod
-    def get_score(cls, listing, weights=None, budget_cap=None, penalty_weight=None, hotspots=None, dist_weight=None):
+    def get_score(cls, listing, model=None):
         """
         Calculates the score for a single listing using current weights and preferences.
+        model: PreferenceModel to score against; defaults to PreferenceModel.current().
+        Scoring against a given model issues no queries.
         """
+        if model is None:
+            model = PreferenceModel.current()
+
         features = cls.get_feature_vector(listing)
         score = 0.0
 
         # Numeric features
-        if weights is None:
-            weights = {fw.feature_name: fw.weight for fw in FeatureWeight.objects.all()}
-        
         for f in cls.NUMERIC_FEATURES:
-            score += features[f] * weights.get(f, 0.0)
+            score += features[f] * model.weights.get(f, 0.0)
 
         # Budget logic
-        if budget_cap is None:
-            budget_cap = LearnedPreference.objects.filter(key='budget_cap').first()
-            budget_cap = budget_cap.value if budget_cap else None
-        
+        budget_cap = model.budget_cap
         if budget_cap and features['list_price'] > budget_cap:
-            if penalty_weight is None:
-                pw_obj = LearnedPreference.objects.filter(key='penalty_weight').first()
-                penalty_weight = pw_obj.value if pw_obj else 1.0
-            
             # Progressive penalty: square of the excess percentage
+            # (plain multiplication rather than ** so BatchScorer reproduces it exactly)
             excess = (features['list_price'] - budget_cap) / budget_cap
-            score -= (excess ** 2) * penalty_weight * 1000 # Scaling factor
+            score -= (excess * excess) * model.penalty_weight * 1000 # Scaling factor
 
         # Neighborhood bonus
-        if features['neighborhood']:
-            nw = NeighborhoodWeight.objects.filter(neighborhood_name=features['neighborhood']).first()
-            if nw:
-                score += nw.weight
+        if features['neighborhood'] and features['neighborhood'] in model.neighborhood_weights:
+            score += model.neighborhood_weights[features['neighborhood']]
 
         # Distance to hotspots
-        if hotspots is None:
-            hotspots = list(FavoriteLocation.objects.all())
-        
-        if hotspots and features['latitude'] and features['longitude']:
+        if model.hotspots and features['latitude'] and features['longitude']:
             min_dist = float('inf')
-            for spot in hotspots:
-                dist = math.sqrt((features['latitude'] - spot.latitude)**2 + (features['longitude'] - spot.longitude)**2)
+            for spot in model.hotspots:
+                dlat = features['latitude'] - spot.latitude
+                dlon = features['longitude'] - spot.longitude
+                dist = math.sqrt(dlat * dlat + dlon * dlon)
                 if dist < min_dist:
                     min_dist = dist
-            
-            if dist_weight is None:
-                dw_obj = FeatureWeight.objects.filter(feature_name='distance_to_hotspot').first()
-                dist_weight = dw_obj.weight if dw_obj else -10.0
-            
-            score += min_dist * dist_weight
+
+            score += min_dist * model.dist_weight
 
         return score
 
     @classmethod
-    def update_weights(cls, listing_a, listing_b, winner):
+    def update_weights(cls, listing_a, listing_b, winner, model=None):
         """
         Updates weights based on a comparison result.
         winner: 'A', 'B', or 'TIE'
+        model: PreferenceModel the vote is applied to; defaults to PreferenceModel.current().
+        Returns the updated PreferenceModel (already persisted).
+        """
+        if model is None:
+            model = PreferenceModel.current()
+
+        return cls.save_model(model, cls.apply_vote(model, listing_a, listing_b, winner))
+
+    @classmethod
+    def apply_vote(cls, model, listing_a, listing_b, winner):
+        """
+        Applies one comparison result to `model` in memory and returns the updated model.
+        New hotspots are unsaved FavoriteLocation instances; see save_model.
         """
         features_a = cls.get_feature_vector(listing_a)
         features_b = cls.get_feature_vector(listing_b)
+        hotspots = list(model.hotspots)
+        budget_cap = model.budget_cap
 
         # Target difference
-        if winner == 'A':
-            target_diff = 1.0
+        if winner in ('A', 'B'):
+            target_diff = 1.0 if winner == 'A' else -1.0
+            winner_listing, winner_features, loser_features = (
+                (listing_a, features_a, features_b) if winner == 'A' else (listing_b, features_b, features_a)
+            )
             # Update hotspots
-            if listing_a.latitude and listing_a.longitude:
-                FavoriteLocation.objects.create(latitude=listing_a.latitude, longitude=listing_a.longitude)
-            # Update budget cap if A is more expensive and won
-            if features_a['list_price'] > features_b['list_price']:
-                cap_obj, _ = LearnedPreference.objects.get_or_create(key='budget_cap', defaults={'value': features_a['list_price']})
-                if features_a['list_price'] > cap_obj.value:
-                    cap_obj.value = features_a['list_price']
-                    cap_obj.save()
-        elif winner == 'B':
-            target_diff = -1.0
-            if listing_b.latitude and listing_b.longitude:
-                FavoriteLocation.objects.create(latitude=listing_b.latitude, longitude=listing_b.longitude)
-            if features_b['list_price'] > features_a['list_price']:
-                cap_obj, _ = LearnedPreference.objects.get_or_create(key='budget_cap', defaults={'value': features_b['list_price']})
-                if features_b['list_price'] > cap_obj.value:
-                    cap_obj.value = features_b['list_price']
-                    cap_obj.save()
+            if winner_listing.latitude and winner_listing.longitude:
+                hotspots.append(FavoriteLocation(latitude=winner_listing.latitude, longitude=winner_listing.longitude))
+            # Update budget cap if the winner is more expensive
+            if winner_features['list_price'] > loser_features['list_price']:
+                if budget_cap is None or winner_features['list_price'] > budget_cap:
+                    budget_cap = winner_features['list_price']
         elif winner == 'NEITHER':
             target_diff = 0.0
             # For NEITHER, we don't update favorites or budget cap.
@@ -117,51 +116,98 @@ class FeatureRanker:
         else:
             target_diff = 0.0
 
-        current_diff = cls.get_score(listing_a) - cls.get_score(listing_b)
+        # The new hotspot and cap already count towards the current difference
+        model = model.replace(hotspots=hotspots, budget_cap=budget_cap)
+        current_diff = cls.get_score(listing_a, model) - cls.get_score(listing_b, model)
         error = target_diff - current_diff
 
         # Update weights for numeric features
+        weights = dict(model.weights)
         for f in cls.NUMERIC_FEATURES:
             delta = cls.LEARNING_RATE * error * (features_a[f] - features_b[f])
-            fw, _ = FeatureWeight.objects.get_or_create(feature_name=f)
-            fw.weight += delta
-            fw.save()
+            weights[f] = weights.get(f, 0.0) + delta
 
         # Update neighborhood weights
+        neighborhood_weights = dict(model.neighborhood_weights)
         if features_a['neighborhood']:
-            nw_a, _ = NeighborhoodWeight.objects.get_or_create(neighborhood_name=features_a['neighborhood'])
-            nw_a.weight += cls.LEARNING_RATE * error * 0.5 # Neighborhoods get partial updates
-            nw_a.save()
+            name = features_a['neighborhood']
+            neighborhood_weights[name] = neighborhood_weights.get(name, 0.0) + cls.LEARNING_RATE * error * 0.5 # Neighborhoods get partial updates
         if features_b['neighborhood']:
-            nw_b, _ = NeighborhoodWeight.objects.get_or_create(neighborhood_name=features_b['neighborhood'])
-            nw_b.weight -= cls.LEARNING_RATE * error * 0.5
-            nw_b.save()
+            name = features_b['neighborhood']
+            neighborhood_weights[name] = neighborhood_weights.get(name, 0.0) - cls.LEARNING_RATE * error * 0.5
+
+        return model.replace(weights=weights, neighborhood_weights=neighborhood_weights)
 
     @classmethod
-    def recompute_all_scores(cls):
+    def save_model(cls, previous, model):
         """
-        Updates RankingScore for all listings.
+        Persists everything apply_vote changed between `previous` and `model`
+        with one statement per table and a single version bump.
+        Returns `model` with saved hotspots and its new version.
         """
-        from listings.models import MlsHistory
-        
-        # Pre-fetch all weights and preferences
-        weights = {fw.feature_name: fw.weight for fw in FeatureWeight.objects.all()}
-        budget_cap = LearnedPreference.objects.filter(key='budget_cap').first()
-        budget_cap = budget_cap.value if budget_cap else None
-        pw_obj = LearnedPreference.objects.filter(key='penalty_weight').first()
-        penalty_weight = pw_obj.value if pw_obj else 1.0
-        hotspots = list(FavoriteLocation.objects.all())
-        dw_obj = FeatureWeight.objects.filter(feature_name='distance_to_hotspot').first()
-        dist_weight = dw_obj.weight if dw_obj else -10.0
-
-        for listing in MlsHistory.objects.all():
-            score_obj, _ = RankingScore.objects.get_or_create(listing=listing)
-            score_obj.score = cls.get_score(
-                listing, 
-                weights=weights, 
-                budget_cap=budget_cap, 
-                penalty_weight=penalty_weight,
-                hotspots=hotspots,
-                dist_weight=dist_weight
+        cls.save_weights(
+            {f: model.weights[f] for f in cls.NUMERIC_FEATURES if f in model.weights},
+            {
+                name: weight for name, weight in model.neighborhood_weights.items()
+                if previous.neighborhood_weights.get(name) != weight
+            },
+        )
+
+        if model.budget_cap != previous.budget_cap:
+            LearnedPreference.objects.bulk_create(
+                [LearnedPreference(key='budget_cap', value=model.budget_cap)],
+                update_conflicts=True,
+                unique_fields=['key'],
+                update_fields=['value'],
+            )
+
+        new_hotspots = [spot for spot in model.hotspots if spot.pk is None]
+        for spot in new_hotspots:
+            spot.location = Point(spot.longitude, spot.latitude, srid=4326)
+        FavoriteLocation.objects.bulk_create(new_hotspots)
+
+        return model.replace(version=PreferenceModel.invalidate())
+
+    @classmethod
+    def save_weights(cls, weights, neighborhood_weights):
+        """
+        Upserts feature and neighborhood weights in one statement each.
+        Bypasses signals, so callers must call PreferenceModel.invalidate().
+        """
+        if weights:
+            FeatureWeight.objects.bulk_create(
+                [FeatureWeight(feature_name=f, weight=w) for f, w in weights.items()],
+                update_conflicts=True,
+                unique_fields=['feature_name'],
+                update_fields=['weight'],
+            )
+        if neighborhood_weights:
+            NeighborhoodWeight.objects.bulk_create(
+                [NeighborhoodWeight(neighborhood_name=n, weight=w) for n, w in neighborhood_weights.items()],
+                update_conflicts=True,
+                unique_fields=['neighborhood_name'],
+                update_fields=['weight'],
             )
-            score_obj.save()
+
+    @classmethod
+    def get_scoring_engine(cls, engine=None):
+        """
+        Resolves a scoring engine name ('numpy' or 'sql') to its implementation.
+        Defaults to settings.RANKING_SCORE_ENGINE.
+        """
+        from .batch_scoring import BatchScorer
+        from .sql_scoring import SqlScorer
+
+        engines = {'numpy': BatchScorer, 'sql': SqlScorer}
+        engine = engine or getattr(settings, 'RANKING_SCORE_ENGINE', 'numpy')
+        if engine not in engines:
+            raise ValueError(f"Unknown scoring engine: {engine}")
+        return engines[engine]
+
+    @classmethod
+    def recompute_all_scores(cls, engine=None):
+        """
+        Updates RankingScore for all listings.
+        engine: 'numpy' (vectorized in-process) or 'sql' (single statement in PostgreSQL).
+        """
+        return cls.get_scoring_engine(engine).recompute(PreferenceModel.load())
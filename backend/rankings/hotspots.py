@@ -0,0 +1,77 @@
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
+from .models import FavoriteLocation
+from .preference_model import PreferenceModel
+
+
+class HotspotCompactor:
+    """
+    Keeps the FavoriteLocation set small by merging nearby hotspots into
+    weighted centroids, so nearest-hotspot lookups stay roughly constant in
+    cost as votes pile up. The merge radius doubles until the set fits the limit.
+    """
+    # Initial merge radius in degrees (~200 m)
+    MERGE_RADIUS = 0.002
+    # 0.002 * 2**18 is over 500 degrees: one cluster takes every hotspot with a position
+    MAX_DOUBLINGS = 18
+
+    @classmethod
+    def cluster(cls, latitude, longitude, weights, radius):
+        """
+        Greedy clustering: the heaviest unassigned hotspot absorbs every unassigned
+        hotspot within `radius`. Returns (latitude, longitude, weight) arrays of centroids.
+        """
+        assigned = np.zeros(len(latitude), dtype=bool)
+        merged = []
+        for i in np.argsort(-weights, kind='stable'):
+            if assigned[i]:
+                continue
+            dlat = latitude - latitude[i]
+            dlon = longitude - longitude[i]
+            members = ~assigned & (dlat * dlat + dlon * dlon <= radius * radius)
+            assigned |= members
+            total = weights[members].sum()
+            merged.append((
+                (latitude[members] * weights[members]).sum() / total,
+                (longitude[members] * weights[members]).sum() / total,
+                total,
+            ))
+        merged = np.array(merged, dtype=np.float64).reshape(-1, 3)
+        return merged[:, 0], merged[:, 1], merged[:, 2]
+
+    @classmethod
+    def compact(cls, limit=None):
+        """
+        Merges hotspots if there are more than `limit` (settings.RANKING_HOTSPOT_LIMIT,
+        at least 1). Returns the number of hotspots removed.
+        """
+        if limit is None:
+            limit = getattr(settings, 'RANKING_HOTSPOT_LIMIT', 256)
+        limit = max(1, int(limit))
+
+        rows = list(FavoriteLocation.objects.values_list('id', 'latitude', 'longitude', 'weight'))
+        if len(rows) <= limit:
+            return 0
+
+        ids, latitude, longitude, weights = (np.array(col) for col in zip(*rows))
+        latitude, longitude, weights = (a.astype(np.float64) for a in (latitude, longitude, weights))
+        radius = cls.MERGE_RADIUS
+        for _ in range(cls.MAX_DOUBLINGS + 1):
+            latitude, longitude, weights = cls.cluster(latitude, longitude, weights, radius)
+            if len(latitude) <= limit:
+                break
+            radius *= 2
+
+        with transaction.atomic():
+            # Raw delete: the per-row post_delete signals would bump the version once per hotspot
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM rankings_favoritelocation WHERE id = ANY(%s)", [ids.tolist()])
+            FavoriteLocation.objects.bulk_create([
+                FavoriteLocation(latitude=lat, longitude=lon, weight=w, location=Point(lon, lat, srid=4326))
+                for lat, lon, w in zip(latitude.tolist(), longitude.tolist(), weights.tolist())
+            ])
+            PreferenceModel.invalidate()
+
+        return len(rows) - len(latitude)
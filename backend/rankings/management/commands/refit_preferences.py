@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from rankings.refit import PreferenceSolver
+
+
+class Command(BaseCommand):
+    help = "Rebuilds all feature and neighborhood weights from the full comparison log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--l2', type=float, default=None, help="L2 regularization strength.")
+        parser.add_argument('--dry-run', action='store_true', help="Print the fitted weights without saving them.")
+
+    def handle(self, *args, **options):
+        try:
+            result = PreferenceSolver.refit(l2=options['l2'], dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if result is None:
+            self.stdout.write("No comparisons to fit.")
+            return
+
+        self.stdout.write(f"Fitted {result['comparisons']} comparisons in {result['iterations']} iterations.")
+        for name, weight in result['weights'].items():
+            self.stdout.write(f"  {name}: {weight:.6g}")
+        self.stdout.write(f"  {len(result['neighborhood_weights'])} neighborhood weights, {len(result['hotspots'])} hotspots")
+        if 'pending_version' in result:
+            self.stdout.write(f"Saved; rescore queued as version {result['pending_version']}.")
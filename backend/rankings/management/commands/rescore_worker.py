@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from rankings.rescore_queue import RescoreQueue
+
+
+class Command(BaseCommand):
+    help = "Background worker that coalesces queued rescore jobs into single full rescores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--engine', choices=['numpy', 'sql'], default=None, help="Scoring engine override.")
+        parser.add_argument('--once', action='store_true', help="Process the current queue once and exit.")
+        parser.add_argument('--full', action='store_true', help="Always run full rescores instead of deltas.")
+
+    def handle(self, *args, **options):
+        recovered = RescoreQueue.recover()
+        if recovered:
+            self.stdout.write(f"Requeued {recovered} interrupted job(s).")
+
+        while True:
+            version = RescoreQueue.process_pending(
+                engine=options['engine'],
+                incremental=False if options['full'] else None
+            )
+            if version is not None:
+                self.stdout.write(f"Scores updated to version {version}.")
+            if options['once']:
+                return
+            if version is None:
+                time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rankings", "0004_alter_rankingcomparison_winner"),
+    ]
+
+    operations = [
+        # Keep the most recent score row if a listing ended up with duplicates
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM rankings_rankingscore older
+                USING rankings_rankingscore newer
+                WHERE older.listing_id = newer.listing_id
+                  AND older.id < newer.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="rankingscore",
+            constraint=models.UniqueConstraint(
+                fields=("listing",), name="unique_rankingscore_listing"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0003_currentlisting"),
+        ("rankings", "0006_rescorejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rankingscore",
+            name="hotspot_distance",
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rescorejob",
+            name="snapshot",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
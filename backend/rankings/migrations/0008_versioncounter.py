@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rankings", "0007_rankingscore_hotspot_distance_rescorejob_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VersionCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=50, unique=True)),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-17 13:30
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rankings", "0008_versioncounter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="favoritelocation",
+            name="location",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True, null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="favoritelocation",
+            name="weight",
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE rankings_favoritelocation
+                SET location = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
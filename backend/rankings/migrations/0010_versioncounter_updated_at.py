@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rankings", "0009_favoritelocation_location_weight"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="versioncounter",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.contrib.gis.db import models
+from django.contrib.gis.geos import Point
+from django.db import connection
 from listings.models import MlsHistory
 
 class FeatureWeight(models.Model):
@@ -25,13 +27,29 @@ class LearnedPreference(models.Model):
 class FavoriteLocation(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Same point as latitude/longitude, GiST-indexed for nearest-hotspot (<->) lookups
+    location = models.PointField(srid=4326, null=True, blank=True)
+    # Number of votes merged into this hotspot by HotspotCompactor
+    weight = models.FloatField(default=1.0)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        self.location = Point(self.longitude, self.latitude, srid=4326)
+        super().save(*args, **kwargs)
+
 class RankingScore(models.Model):
     listing = models.ForeignKey(MlsHistory, on_delete=models.CASCADE, related_name='ranking_scores')
     score = models.FloatField(default=0.0)
+    # Distance to the nearest hotspot behind the score's hotspot term; drives delta rescoring
+    hotspot_distance = models.FloatField(null=True, blank=True, db_index=True)
     last_updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # One score per snapshot; lets recompute_all_scores upsert in bulk
+            models.UniqueConstraint(fields=['listing'], name='unique_rankingscore_listing'),
+        ]
+
     def __str__(self):
         return f"{self.listing} - {self.score}"
 
@@ -49,3 +67,60 @@ class RankingComparison(models.Model):
 
     class Meta:
         verbose_name_plural = "Ranking Comparisons"
+
+class RescoreJob(models.Model):
+    """
+    Queue entry for a full rescore. Votes enqueue at most one pending job;
+    the rescore worker claims every pending job at once and runs a single rescore.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    # Preferences the stored scores reflect once this job is done (see DeltaScorer.snapshot)
+    snapshot = models.JSONField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Rescore #{self.id} ({self.status})"
+
+class VersionCounter(models.Model):
+    """
+    Named monotonic counters used to invalidate per-process caches,
+    e.g. 'preferences' is bumped on every preference write and 'ingest'
+    after every scraper run.
+    """
+    key = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    # Time of the last bump; served as Last-Modified by conditional GETs
+    updated_at = models.DateTimeField(auto_now=True, null=True)
+
+    @classmethod
+    def get(cls, key):
+        return cls.objects.filter(key=key).values_list('value', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, key):
+        """
+        Atomically increments (creating if needed) and returns the counter.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO rankings_versioncounter (key, value, updated_at) VALUES (%s, 1, now())
+                ON CONFLICT (key) DO UPDATE SET value = rankings_versioncounter.value + 1, updated_at = now()
+                RETURNING value
+            """, [key])
+            return cursor.fetchone()[0]
+
+    def __str__(self):
+        return f"{self.key}: {self.value}"
@@ -0,0 +1,206 @@
+import random
+import numpy as np
+from listings.models import CurrentListing, MlsHistory
+from .models import RankingComparison, RankingScore
+from .versions import DataVersions
+
+
+class PairSelector:
+    """
+    Active-learning pair selection for the comparison endpoint.
+
+    A vote carries the most information when the model cannot already
+    predict it: the two listings score close together and at least one of
+    them has rarely been compared. The selector keeps an in-process index of
+    the current snapshot of every listing, sorted by score, with an
+    uncertainty of 1 / sqrt(1 + comparisons) per listing. A request draws a
+    listing in proportion to its uncertainty (binary search on the cumulative
+    uncertainty) and pairs it with its more uncertain score neighbour, so
+    selection is O(log n) once the index is built.
+
+    Listings that were never compared are paired with an anchor, a
+    well-compared listing of the nearest score, to place them quickly.
+
+    The current snapshots are those of the current_listings view, so the
+    listing set is reloaded only when the ingest generation moves. A new
+    scores_version re-reads just the scores of those listings and the votes
+    cast since the last load, then re-sorts.
+    """
+    ANCHOR_MIN_COMPARISONS = 3
+    EXPLORE_RATE = 0.25
+
+    _cached = None
+
+    @classmethod
+    def build(cls):
+        """
+        Loads the listing state: the current snapshot of every listing, the
+        listing each snapshot belongs to, and vote counts per listing.
+        """
+        rows = list(CurrentListing.objects.order_by('id').values_list('id', 'listing_id'))
+        ids = np.fromiter((snapshot_id for snapshot_id, _ in rows), dtype=np.int64, count=len(rows))
+
+        # Votes on any snapshot of a listing count towards the listing;
+        # snapshots without a listing_id stand on their own
+        listing_of = {snapshot_id: i for i, (snapshot_id, _) in enumerate(rows)}
+        listing_position = {listing_id: i for i, (_, listing_id) in enumerate(rows) if listing_id}
+        snapshots = MlsHistory.objects.exclude(listing_id__isnull=True).exclude(listing_id='')
+        for snapshot_id, listing_id in snapshots.values_list('id', 'listing_id'):
+            if listing_id in listing_position:
+                listing_of.setdefault(snapshot_id, listing_position[listing_id])
+
+        state = {
+            'ids': ids,
+            'listing_of': listing_of,
+            'scores': np.zeros(len(ids), dtype=np.float64),
+            'comparisons': np.zeros(len(ids), dtype=np.int64),
+            'last_comparison_id': 0,
+        }
+        cls.load_scores(state)
+        cls.count_comparisons(state)
+        return state
+
+    @classmethod
+    def load_scores(cls, state):
+        """
+        Reads the stored score of every current snapshot into state.
+        """
+        scores = np.full(len(state['ids']), np.nan)
+        position = state['listing_of']
+        rows = RankingScore.objects.filter(listing_id__in=CurrentListing.objects.values('id'))
+        for snapshot_id, score in rows.values_list('listing_id', 'score'):
+            if snapshot_id in position:
+                scores[position[snapshot_id]] = score
+        # Unscored listings are placed mid-table until the next rescore
+        if len(scores) and np.isnan(scores).any():
+            fill = np.nanmedian(scores) if not np.isnan(scores).all() else 0.0
+            scores[np.isnan(scores)] = fill
+        state['scores'] = scores
+
+    @classmethod
+    def count_comparisons(cls, state):
+        """
+        Adds the votes cast since the last count to state.
+        """
+        comparisons = RankingComparison.objects.filter(id__gt=state['last_comparison_id'])
+        last = state['last_comparison_id']
+        for comparison_id, a, b in comparisons.order_by('id').values_list('id', 'listing_a_id', 'listing_b_id'):
+            for snapshot_id in (a, b):
+                if snapshot_id in state['listing_of']:
+                    state['comparisons'][state['listing_of'][snapshot_id]] += 1
+            last = comparison_id
+        state['last_comparison_id'] = last
+
+    @classmethod
+    def rank(cls, state):
+        """
+        The index arrays for select(): one row per listing, sorted by score.
+        """
+        order = np.argsort(state['scores'], kind='stable')
+        ids, scores, comparisons = state['ids'][order], state['scores'][order], state['comparisons'][order]
+        uncertainty = 1.0 / np.sqrt(1.0 + comparisons)
+
+        anchors = np.flatnonzero(comparisons >= cls.ANCHOR_MIN_COMPARISONS)
+        return {
+            'ids': ids,
+            'scores': scores,
+            'uncertainty': uncertainty,
+            'cumulative': np.cumsum(uncertainty),
+            'fresh': np.flatnonzero(comparisons == 0),
+            'anchors': anchors,
+            'anchor_scores': scores[anchors],
+        }
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the cached index: rebuilt after an ingest, re-scored after a rescore.
+        """
+        versions = DataVersions.current(('ingest', 'scores'))
+        generation, scores_version = versions['ingest'][0], versions['scores'][0]
+        cached = PairSelector._cached
+        if cached is None or cached['generation'] != generation:
+            cached = {'generation': generation, 'scores_version': scores_version, 'state': cls.build()}
+        elif cached['scores_version'] != scores_version:
+            cls.load_scores(cached['state'])
+            cls.count_comparisons(cached['state'])
+            cached = {**cached, 'scores_version': scores_version}
+        else:
+            return cached['index']
+        cached['index'] = cls.rank(cached['state'])
+        PairSelector._cached = cached
+        return cached['index']
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drops the cached index; the next select() rebuilds it.
+        """
+        PairSelector._cached = None
+
+    @classmethod
+    def discard(cls, ids):
+        """
+        Removes snapshots that no longer exist (deleted since the last ingest) from the cached index.
+        """
+        cached = PairSelector._cached
+        if cached is None:
+            return
+        state = cached['state']
+        keep = ~np.isin(state['ids'], list(ids))
+        remap = np.cumsum(keep) - 1
+        state.update(
+            ids=state['ids'][keep],
+            scores=state['scores'][keep],
+            comparisons=state['comparisons'][keep],
+            listing_of={s: int(remap[i]) for s, i in state['listing_of'].items() if keep[i]},
+        )
+        cached['index'] = cls.rank(state)
+
+    @classmethod
+    def _anchor_for(cls, index, i):
+        """
+        Position of the anchor whose score is closest to position i (never i itself).
+        Falls back to a score neighbour when there are no other anchors.
+        """
+        anchors, anchor_scores = index['anchors'], index['anchor_scores']
+        score = index['scores'][i]
+        j = int(np.searchsorted(anchor_scores, score))
+        candidates = [k for k in (j - 1, j, j + 1) if 0 <= k < len(anchors) and anchors[k] != i]
+        if not candidates:
+            return cls._neighbour(index, i)
+        return int(anchors[min(candidates, key=lambda k: abs(anchor_scores[k] - score))])
+
+    @classmethod
+    def _neighbour(cls, index, i):
+        """
+        The more uncertain of the two score neighbours of position i.
+        """
+        uncertainty = index['uncertainty']
+        if i == 0:
+            return 1
+        if i == len(uncertainty) - 1:
+            return i - 1
+        return i - 1 if uncertainty[i - 1] >= uncertainty[i + 1] else i + 1
+
+    @classmethod
+    def select(cls, rng=random):
+        """
+        Returns a pair of MlsHistory ids to compare, or None if fewer than two listings exist.
+        """
+        index = cls.current()
+        if len(index['ids']) < 2:
+            return None
+
+        if len(index['fresh']) and rng.random() < cls.EXPLORE_RATE:
+            i = int(index['fresh'][rng.randrange(len(index['fresh']))])
+            j = cls._anchor_for(index, i)
+        else:
+            cumulative = index['cumulative']
+            i = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right'))
+            i = min(i, len(cumulative) - 1)
+            j = cls._neighbour(index, i)
+
+        pair = [int(index['ids'][i]), int(index['ids'][j])]
+        rng.shuffle(pair)
+        return pair
@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field, replace
+from .models import FeatureWeight, NeighborhoodWeight, LearnedPreference, FavoriteLocation, VersionCounter
+
+
+@dataclass(frozen=True)
+class PreferenceModel:
+    """
+    Immutable snapshot of every weight and learned preference used for scoring.
+
+    Scoring against a PreferenceModel costs zero queries. PreferenceModel.current()
+    keeps one snapshot per process and reloads it only when the 'preferences'
+    VersionCounter has moved, which every preference write bumps (see signals.py).
+    """
+    VERSION_KEY = 'preferences'
+
+    weights: dict = field(default_factory=dict)
+    budget_cap: float = None
+    penalty_weight: float = 1.0
+    neighborhood_weights: dict = field(default_factory=dict)
+    hotspots: list = field(default_factory=list)
+    dist_weight: float = -10.0
+    version: int = 0
+
+    _cached = None
+
+    @classmethod
+    def load(cls):
+        """
+        Reads the full preference state from the database.
+        """
+        # Read the version first: a write racing with the load can only make the
+        # snapshot newer than its version, which just triggers one extra reload
+        version = VersionCounter.get(cls.VERSION_KEY)
+        weights = {fw.feature_name: fw.weight for fw in FeatureWeight.objects.all()}
+        preferences = dict(LearnedPreference.objects.values_list('key', 'value'))
+
+        return cls(
+            weights=weights,
+            budget_cap=preferences.get('budget_cap'),
+            penalty_weight=preferences.get('penalty_weight', 1.0),
+            neighborhood_weights=dict(NeighborhoodWeight.objects.values_list('neighborhood_name', 'weight')),
+            hotspots=list(FavoriteLocation.objects.order_by('id')),
+            dist_weight=weights.get('distance_to_hotspot', -10.0),
+            version=version,
+        )
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the cached snapshot, reloading it if the version counter has moved.
+        Costs one query when the cache is fresh.
+        """
+        cached = PreferenceModel._cached
+        if cached is None or cached.version != VersionCounter.get(cls.VERSION_KEY):
+            cached = cls.load()
+            PreferenceModel._cached = cached
+        return cached
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Bumps the version counter so every process reloads on its next current().
+        """
+        PreferenceModel._cached = None
+        return VersionCounter.bump(cls.VERSION_KEY)
+
+    def replace(self, **changes):
+        """
+        Returns a copy with the given fields changed.
+        """
+        return replace(self, **changes)
@@ -0,0 +1,170 @@
+import numpy as np
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
+from listings.models import MlsHistory
+from .batch_scoring import BatchScorer
+from .feature_ranker import FeatureRanker
+from .models import RankingComparison, LearnedPreference, FavoriteLocation
+from .preference_model import PreferenceModel
+from .rescore_queue import RescoreQueue
+
+
+class PreferenceSolver:
+    """
+    Batch alternative to the online updates in FeatureRanker.update_weights.
+
+    Rebuilds every feature and neighborhood weight from the full
+    RankingComparison log with an L2-regularized Bradley-Terry fit:
+    P(A beats B) = sigmoid(score(A) - score(B)), where the score difference
+    is linear in the feature difference x_a - x_b. Ties and NEITHER votes
+    count as half a win for each side. The budget cap and hotspots are
+    replayed from the log with the same rules as update_weights, so the
+    preference state is fully reproducible from the comparisons.
+    """
+    L2 = 1.0
+    MAX_ITERATIONS = 50
+    TOLERANCE = 1e-8
+    OUTCOMES = {'A': 1.0, 'B': 0.0, 'TIE': 0.5, 'NEITHER': 0.5}
+
+    @classmethod
+    def load(cls):
+        """
+        Loads the comparison log and the features of every compared listing.
+        Returns (comparisons, features, row) where row maps listing id to feature row.
+        """
+        comparisons = list(
+            RankingComparison.objects.order_by('id').values_list('listing_a_id', 'listing_b_id', 'winner')
+        )
+        listing_ids = {a for a, _, _ in comparisons} | {b for _, b, _ in comparisons}
+        features = BatchScorer.load_features(MlsHistory.objects.filter(id__in=listing_ids))
+        row = {listing_id: i for i, listing_id in enumerate(features['id'].tolist())}
+        return comparisons, features, row
+
+    @classmethod
+    def design_matrix(cls, comparisons, features, row):
+        """
+        Pairwise difference matrix: standardized numeric feature differences
+        followed by +1/-1 neighborhood indicators. Returns (X, y, scale, names).
+        """
+        a = np.array([row[c[0]] for c in comparisons], dtype=np.int64)
+        b = np.array([row[c[1]] for c in comparisons], dtype=np.int64)
+        y = np.array([cls.OUTCOMES[c[2]] for c in comparisons], dtype=np.float64)
+
+        numeric = np.column_stack([features[f][a] - features[f][b] for f in FeatureRanker.NUMERIC_FEATURES])
+        scale = numeric.std(axis=0)
+        scale[scale == 0] = 1.0
+
+        names = features['neighborhood_names']
+        neighborhoods = np.zeros((len(comparisons), len(names)), dtype=np.float64)
+        codes_a, codes_b = features['neighborhood_code'][a], features['neighborhood_code'][b]
+        rows = np.arange(len(comparisons))
+        np.add.at(neighborhoods, (rows[codes_a >= 0], codes_a[codes_a >= 0]), 1.0)
+        np.add.at(neighborhoods, (rows[codes_b >= 0], codes_b[codes_b >= 0]), -1.0)
+
+        return np.hstack([numeric / scale, neighborhoods]), y, scale, names
+
+    @classmethod
+    def fit(cls, X, y, l2=None):
+        """
+        Newton's method on the regularized logistic loss.
+        Returns (coefficients, iterations). Raises ValueError if l2 is not a
+        positive number or the fit breaks down numerically.
+        """
+        l2 = cls.L2 if l2 is None else l2
+        if not np.isfinite(l2) or l2 <= 0:
+            raise ValueError("l2 must be a positive number")
+        w = np.zeros(X.shape[1], dtype=np.float64)
+        identity = np.eye(X.shape[1])
+        for iteration in range(1, cls.MAX_ITERATIONS + 1):
+            p = 0.5 * (1.0 + np.tanh(0.5 * (X @ w)))  # numerically stable sigmoid
+            gradient = X.T @ (p - y) + l2 * w
+            hessian = (X * (p * (1.0 - p))[:, None]).T @ X + l2 * identity
+            if not (np.isfinite(gradient).all() and np.isfinite(hessian).all()):
+                raise ValueError("Preference fit diverged")
+            try:
+                step = np.linalg.solve(hessian, gradient)
+            except np.linalg.LinAlgError:
+                # Singular in floating point (e.g. extreme feature values); take the least-squares step
+                step = np.linalg.lstsq(hessian, gradient, rcond=None)[0]
+            w -= step
+            if np.abs(step).max(initial=0.0) < cls.TOLERANCE:
+                break
+        return w, iteration
+
+    @classmethod
+    def replay(cls, comparisons, features, row):
+        """
+        Replays the budget cap and hotspot rules of update_weights over the log.
+        Returns (budget_cap, hotspots) with hotspots as (latitude, longitude) pairs.
+        """
+        budget_cap = None
+        hotspots = []
+        price = features['list_price']
+        for listing_a, listing_b, winner in comparisons:
+            if winner not in ('A', 'B'):
+                continue
+            won, lost = (row[listing_a], row[listing_b]) if winner == 'A' else (row[listing_b], row[listing_a])
+            if features['has_location'][won]:
+                hotspots.append((float(features['latitude'][won]), float(features['longitude'][won])))
+            if price[won] > price[lost] and (budget_cap is None or price[won] > budget_cap):
+                budget_cap = float(price[won])
+        return budget_cap, hotspots
+
+    @classmethod
+    def solve(cls, l2=None):
+        """
+        Fits weights from the comparison log without writing anything.
+        Returns a result dict, or None if there are no comparisons.
+        """
+        comparisons, features, row = cls.load()
+        if not comparisons:
+            return None
+
+        X, y, scale, names = cls.design_matrix(comparisons, features, row)
+        coefficients, iterations = cls.fit(X, y, l2)
+        numeric_count = len(FeatureRanker.NUMERIC_FEATURES)
+        budget_cap, hotspots = cls.replay(comparisons, features, row)
+
+        return {
+            'comparisons': len(comparisons),
+            'iterations': iterations,
+            'weights': dict(zip(FeatureRanker.NUMERIC_FEATURES, (coefficients[:numeric_count] / scale).tolist())),
+            'neighborhood_weights': dict(zip(names, coefficients[numeric_count:].tolist())),
+            'budget_cap': budget_cap,
+            'hotspots': hotspots,
+        }
+
+    @classmethod
+    def apply(cls, result):
+        """
+        Replaces the stored preference state with a solve() result in one transaction.
+        """
+        with transaction.atomic():
+            # Raw deletes: per-row signals would bump the preference version once per row
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM rankings_neighborhoodweight")
+                cursor.execute("DELETE FROM rankings_learnedpreference WHERE key = 'budget_cap'")
+                cursor.execute("DELETE FROM rankings_favoritelocation")
+
+            FeatureRanker.save_weights(result['weights'], result['neighborhood_weights'])
+            if result['budget_cap'] is not None:
+                LearnedPreference.objects.bulk_create([LearnedPreference(key='budget_cap', value=result['budget_cap'])])
+            FavoriteLocation.objects.bulk_create([
+                FavoriteLocation(latitude=lat, longitude=lon, location=Point(lon, lat, srid=4326))
+                for lat, lon in result['hotspots']
+            ])
+            PreferenceModel.invalidate()
+
+    @classmethod
+    def refit(cls, l2=None, dry_run=False):
+        """
+        Solves and, unless dry_run, persists the refit and queues a rescore.
+        """
+        result = cls.solve(l2)
+        if result is None or dry_run:
+            return result
+
+        with transaction.atomic():
+            cls.apply(result)
+            result['pending_version'] = RescoreQueue.enqueue().id
+        return result
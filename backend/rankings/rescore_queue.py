@@ -0,0 +1,142 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from listings.models import MlsHistory
+from .models import RescoreJob
+from .feature_ranker import FeatureRanker
+from .delta_scoring import DeltaScorer
+from .preference_model import PreferenceModel
+from .hotspots import HotspotCompactor
+
+logger = logging.getLogger(__name__)
+
+
+class RescoreQueue:
+    """
+    Coalescing queue of full rescores backed by the RescoreJob table.
+    Any number of votes between two worker passes collapse into one rescore.
+    """
+    # pg_advisory_xact_lock key serializing rescore passes across workers
+    LOCK_KEY = 7234001
+    # Seconds a claimed job may take to reach LOCK_KEY; recover() leaves younger jobs alone
+    CLAIM_GRACE = 60
+
+    @classmethod
+    def enqueue(cls):
+        """
+        Returns the pending job that will pick up the caller's changes, creating one if needed.
+        Call inside the transaction that writes the changes: the job row stays locked until
+        commit, so the worker cannot start the rescore before the new weights are visible.
+        """
+        job = RescoreJob.objects.select_for_update().filter(status=RescoreJob.PENDING).order_by('id').first()
+        if job is None:
+            job = RescoreJob.objects.create()
+        return job
+
+    @classmethod
+    def scores_version(cls):
+        """
+        Monotonic version of the stored scores: the id of the latest completed rescore job.
+        """
+        return RescoreJob.objects.filter(status=RescoreJob.DONE).aggregate(version=Max('id'))['version'] or 0
+
+    @classmethod
+    def pending_version(cls):
+        """
+        The scores_version that will be reached once queued work completes, or None if idle.
+        """
+        return RescoreJob.objects.filter(
+            status__in=[RescoreJob.PENDING, RescoreJob.RUNNING]
+        ).aggregate(version=Max('id'))['version']
+
+    @classmethod
+    def claim(cls):
+        """
+        Marks every unlocked pending job as running and returns their ids.
+        """
+        with transaction.atomic():
+            ids = list(
+                RescoreJob.objects.select_for_update(skip_locked=True)
+                .filter(status=RescoreJob.PENDING)
+                .values_list('id', flat=True)
+            )
+            if ids:
+                RescoreJob.objects.filter(id__in=ids).update(status=RescoreJob.RUNNING, started_at=timezone.now())
+        return ids
+
+    @classmethod
+    def recover(cls):
+        """
+        Requeues jobs left running by a worker that died mid-rescore. Does nothing while
+        another worker holds LOCK_KEY (it is rescoring them), and skips jobs claimed within
+        CLAIM_GRACE seconds, which may still be on their way to the lock.
+        Returns the number of jobs requeued.
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [cls.LOCK_KEY])
+                if not cursor.fetchone()[0]:
+                    return 0
+            cutoff = timezone.now() - timedelta(seconds=cls.CLAIM_GRACE)
+            return RescoreJob.objects.filter(
+                Q(started_at__lt=cutoff) | Q(started_at__isnull=True), status=RescoreJob.RUNNING
+            ).update(status=RescoreJob.PENDING, started_at=None)
+
+    @classmethod
+    def rescore(cls, job_ids, engine=None, incremental=True):
+        """
+        Brings stored scores up to the current preferences and marks `job_ids` done,
+        atomically. Applies a DeltaScorer pass from the last completed snapshot when
+        possible, otherwise a full rescore with the selected engine.
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [cls.LOCK_KEY])
+
+            # Compaction removes hotspots, which makes this pass a full rescore
+            HotspotCompactor.compact()
+
+            base = (
+                RescoreJob.objects.filter(status=RescoreJob.DONE)
+                .order_by('-id').values_list('snapshot', flat=True).first()
+            )
+            listing_max_id = MlsHistory.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+            preferences = PreferenceModel.load()
+
+            if incremental and DeltaScorer.can_apply(base, preferences):
+                DeltaScorer.apply(base, preferences)
+            else:
+                FeatureRanker.get_scoring_engine(engine).recompute(preferences)
+
+            RescoreJob.objects.filter(id__in=job_ids).update(
+                status=RescoreJob.DONE,
+                finished_at=timezone.now(),
+                snapshot=DeltaScorer.snapshot(preferences, listing_max_id),
+            )
+
+    @classmethod
+    def process_pending(cls, engine=None, incremental=None):
+        """
+        Runs one rescore covering all pending jobs.
+        Returns the new scores_version, or None if there was nothing to do or the rescore failed.
+        """
+        ids = cls.claim()
+        if not ids:
+            return None
+
+        if incremental is None:
+            incremental = getattr(settings, 'RANKING_INCREMENTAL_RESCORE', True)
+
+        try:
+            cls.rescore(ids, engine=engine, incremental=incremental)
+        except Exception as e:
+            logger.error(f"Rescore failed for jobs {ids}: {e}", exc_info=True)
+            RescoreJob.objects.filter(id__in=ids).update(
+                status=RescoreJob.FAILED, finished_at=timezone.now(), error=str(e)
+            )
+            return None
+
+        return max(ids)
@@ -0,0 +1,86 @@
+import hashlib
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+from listings.models import MlsHistory
+from .rescore_queue import RescoreQueue
+
+
+class ScoreHistogram:
+    """
+    Ranking score histogram computed in PostgreSQL with width_bucket.
+
+    One statement finds the score range and the per-bin counts over the
+    listings matched by a queryset, so no scores leave the database.
+    Results are cached per (filter parameters, scores_version, newest listing):
+    any rescore or scraper insert moves the key.
+    """
+    DEFAULT_BINS = 10
+    MAX_BINS = 200
+    CACHE_PREFIX = 'ranking-distribution'
+    CACHE_TIMEOUT = 60 * 60
+
+    @classmethod
+    def compute(cls, listings, bins=None):
+        """
+        Histogram of the scores of `listings` (a listing queryset).
+        Returns {"bins": bin edges, "counts": per-bin counts}; the last bin includes the maximum.
+        """
+        bins = bins or cls.DEFAULT_BINS
+        listing_sql, listing_params = listings.order_by().values('id').query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH s AS (
+                    SELECT rs.score FROM rankings_rankingscore rs
+                    WHERE rs.listing_id IN ({listing_sql})
+                ), r AS (
+                    SELECT min(score) AS lo, max(score) AS hi FROM s
+                )
+                SELECT r.lo, r.hi,
+                       CASE WHEN r.hi > r.lo THEN least(width_bucket(s.score, r.lo, r.hi, %s), %s) ELSE 1 END AS bucket,
+                       count(*)
+                FROM s CROSS JOIN r
+                GROUP BY r.lo, r.hi, bucket
+                ORDER BY bucket
+            """, list(listing_params) + [bins, bins])
+            rows = cursor.fetchall()
+
+        if not rows:
+            return {"bins": [], "counts": []}
+
+        low, high = rows[0][0], rows[0][1]
+        if low == high:
+            return {"bins": [low, high + 1], "counts": [rows[0][3]]}
+
+        bin_size = (high - low) / bins
+        counts = [0] * bins
+        for _, _, bucket, count in rows:
+            counts[bucket - 1] = count
+        return {
+            "bins": [low + i * bin_size for i in range(bins + 1)],
+            "counts": counts
+        }
+
+    @classmethod
+    def cache_key(cls, params, bins):
+        """
+        Cache key for a request: a hash of the normalized filter parameters plus
+        the versions of the scores and listings it was computed from.
+        """
+        normalized = sorted((key, tuple(sorted(params.getlist(key)))) for key in params)
+        digest = hashlib.sha1(repr((normalized, bins)).encode()).hexdigest()
+        newest = MlsHistory.objects.aggregate(m=Max('id'))['m'] or 0
+        return f"{cls.CACHE_PREFIX}:{digest}:{RescoreQueue.scores_version()}:{newest}"
+
+    @classmethod
+    def cached(cls, listings, params, bins=None):
+        """
+        compute() through the cache, keyed on the request's query parameters.
+        """
+        key = cls.cache_key(params, bins)
+        result = cache.get(key)
+        if result is None:
+            result = cls.compute(listings, bins)
+            cache.set(key, result, cls.CACHE_TIMEOUT)
+        return result
@@ -1,9 +1,22 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from listings.models import MlsHistory
-from .models import RankingScore
+from .models import RankingScore, FeatureWeight, NeighborhoodWeight, LearnedPreference, FavoriteLocation
+from .preference_model import PreferenceModel
 
 @receiver(post_save, sender=MlsHistory)
 def create_ranking_score(sender, instance, created, **kwargs):
     if created:
         RankingScore.objects.get_or_create(listing=instance)
+
+@receiver(post_save, sender=FeatureWeight)
+@receiver(post_save, sender=NeighborhoodWeight)
+@receiver(post_save, sender=LearnedPreference)
+@receiver(post_save, sender=FavoriteLocation)
+@receiver(post_delete, sender=FeatureWeight)
+@receiver(post_delete, sender=NeighborhoodWeight)
+@receiver(post_delete, sender=LearnedPreference)
+@receiver(post_delete, sender=FavoriteLocation)
+def invalidate_preference_model(sender, **kwargs):
+    # Bulk writes (bulk_create, QuerySet.update) skip signals and must invalidate explicitly
+    PreferenceModel.invalidate()
@@ -0,0 +1,100 @@
+from django.db import connection
+
+
+class SqlScorer:
+    """
+    In-database scoring engine used by FeatureRanker.recompute_all_scores.
+
+    The current preferences are compiled into a single
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE over listings_mlshistory,
+    so a full rescore is one round trip and no listing rows leave PostgreSQL.
+    Terms are evaluated in the same order as FeatureRanker.get_score.
+
+    Hotspots travel as parameters, like the neighborhood weights, so the
+    statement scores against the model it was given (a cached or replayed
+    PreferenceModel need not match rankings_favoritelocation). Compaction
+    keeps them to a few hundred, so each listing scans them for the nearest.
+    """
+
+    @classmethod
+    def compile(cls, preferences):
+        """
+        Builds the upsert statement and its parameters for a PreferenceModel.
+        """
+        from .feature_ranker import FeatureRanker
+
+        weights = preferences.weights
+        params = []
+
+        # Neighborhood weights travel as two parallel arrays
+        neighborhood_weights = preferences.neighborhood_weights
+        params += [list(neighborhood_weights), list(neighborhood_weights.values())]
+        hotspots = preferences.hotspots
+        # And so do the hotspot coordinates
+        params += [[spot.latitude for spot in hotspots], [spot.longitude for spot in hotspots]]
+
+        # Numeric features
+        score_sql = "0.0::float8"
+        for f in FeatureRanker.NUMERIC_FEATURES:
+            score_sql = f"({score_sql} + COALESCE(l.{f}, 0)::float8 * %s::float8)"
+            params.append(weights.get(f, 0.0))
+
+        # Budget logic
+        budget_cap = preferences.budget_cap
+        if budget_cap:
+            price_sql = "COALESCE(l.list_price, 0)::float8"
+            excess_sql = f"(({price_sql} - %s::float8) / %s::float8)"
+            score_sql = (
+                f"({score_sql} - CASE WHEN {price_sql} > %s::float8 "
+                f"THEN ({excess_sql} * {excess_sql}) * %s::float8 * 1000 ELSE 0.0 END)"
+            )
+            params += [budget_cap] * 5 + [preferences.penalty_weight]
+
+        # Neighborhood bonus
+        score_sql = f"({score_sql} + COALESCE(nw.weight, 0.0))"
+
+        # Distance to the nearest hotspot, in float8 to match the Python arithmetic
+        hotspot_join = ""
+        distance_sql = "NULL::float8"
+        if hotspots:
+            distance_sql = "nearest.dist"
+            hotspot_join = """
+                LEFT JOIN LATERAL (
+                    SELECT min(sqrt(
+                        (l.latitude - h.latitude) * (l.latitude - h.latitude)
+                        + (l.longitude - h.longitude) * (l.longitude - h.longitude)
+                    )) AS dist
+                    FROM hotspots h
+                ) nearest ON l.latitude <> 0 AND l.longitude <> 0
+            """
+            score_sql = f"({score_sql} + COALESCE(nearest.dist * %s::float8, 0.0))"
+            params.append(preferences.dist_weight)
+
+        sql = f"""
+            WITH neighborhood_weights (name, weight) AS (
+                SELECT * FROM unnest(%s::text[], %s::float8[])
+            ), hotspots (latitude, longitude) AS MATERIALIZED (
+                SELECT * FROM unnest(%s::float8[], %s::float8[])
+            )
+            INSERT INTO rankings_rankingscore (listing_id, score, hotspot_distance, last_updated)
+            SELECT l.id, {score_sql}, {distance_sql}, now()
+            FROM listings_mlshistory l
+            LEFT JOIN neighborhood_weights nw ON nw.name = l.neighborhoods
+            {hotspot_join}
+            ON CONFLICT (listing_id) DO UPDATE
+            SET score = EXCLUDED.score,
+                hotspot_distance = EXCLUDED.hotspot_distance,
+                last_updated = EXCLUDED.last_updated
+        """
+        return sql, params
+
+    @classmethod
+    def recompute(cls, preferences):
+        """
+        Scores and persists every listing in one statement.
+        Returns the number of listings scored.
+        """
+        sql, params = cls.compile(preferences)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
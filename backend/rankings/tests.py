@@ -1,7 +1,15 @@
-from django.test import TestCase
-from listings.models import MlsHistory
-from .models import FeatureWeight, LearnedPreference, NeighborhoodWeight, RankingScore
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from listings.models import CurrentListing, MlsHistory
+from .models import FeatureWeight, LearnedPreference, NeighborhoodWeight, RankingScore, RescoreJob
 from .feature_ranker import FeatureRanker
+from .rescore_queue import RescoreQueue
+from .delta_scoring import DeltaScorer
+from .preference_model import PreferenceModel
+from .hotspots import HotspotCompactor
+from .refit import PreferenceSolver
+from .pair_selection import PairSelector
+from .score_histogram import ScoreHistogram
 
 class FeatureRankingTests(TestCase):
     def setUp(self):
@@ -103,3 +111,601 @@ class FeatureRankingTests(TestCase):
         # Wait, current_diff might not be 0, but target_diff is 0.
         # It's treated like a TIE. 
         # If A and B were already scored correctly, no update.
+
+class BatchScoringTests(TestCase):
+    def setUp(self):
+        from .models import FavoriteLocation
+        self.listings = [
+            MlsHistory.objects.create(
+                formatted_address="1 Over Budget Ave",
+                list_price=950000,
+                beds=4,
+                full_baths=3,
+                sqft=2400,
+                year_built=1990,
+                neighborhoods="Northside",
+                latitude=40.1,
+                longitude=-70.2
+            ),
+            MlsHistory.objects.create(
+                formatted_address="2 Under Budget Rd",
+                list_price=450000,
+                beds=2,
+                full_baths=1,
+                lot_sqft=3000,
+                neighborhoods="Southside",
+                latitude=41.3,
+                longitude=-71.1
+            ),
+            # Missing price, coordinates and neighborhood
+            MlsHistory.objects.create(formatted_address="3 Sparse Ln", beds=3),
+        ]
+        for f, w in [('beds', 2.5), ('full_baths', -1.25), ('sqft', 0.01), ('year_built', 0.003), ('lot_sqft', 0.0007)]:
+            FeatureWeight.objects.create(feature_name=f, weight=w)
+        FeatureWeight.objects.create(feature_name='distance_to_hotspot', weight=-7.5)
+        LearnedPreference.objects.create(key='budget_cap', value=700000.0)
+        LearnedPreference.objects.create(key='penalty_weight', value=1.3)
+        NeighborhoodWeight.objects.create(neighborhood_name="Northside", weight=0.42)
+        FavoriteLocation.objects.create(latitude=40.0, longitude=-70.0)
+        FavoriteLocation.objects.create(latitude=41.5, longitude=-71.4)
+
+    def test_batch_scores_match_get_score(self):
+        FeatureRanker.recompute_all_scores()
+        for listing in self.listings:
+            stored = RankingScore.objects.get(listing=listing).score
+            self.assertEqual(stored, FeatureRanker.get_score(listing))
+
+    def test_recompute_upserts_single_row_per_listing(self):
+        FeatureRanker.recompute_all_scores()
+        FeatureRanker.recompute_all_scores()
+        self.assertEqual(RankingScore.objects.count(), len(self.listings))
+
+    def test_sql_engine_matches_get_score(self):
+        FeatureRanker.recompute_all_scores(engine='sql')
+        for listing in self.listings:
+            stored = RankingScore.objects.get(listing=listing).score
+            self.assertAlmostEqual(stored, FeatureRanker.get_score(listing), places=6)
+        self.assertEqual(RankingScore.objects.count(), len(self.listings))
+
+    def test_engines_agree(self):
+        FeatureRanker.recompute_all_scores(engine='numpy')
+        numpy_scores = dict(RankingScore.objects.values_list('listing_id', 'score'))
+        FeatureRanker.recompute_all_scores(engine='sql')
+        sql_scores = dict(RankingScore.objects.values_list('listing_id', 'score'))
+        self.assertEqual(numpy_scores.keys(), sql_scores.keys())
+        for listing_id, score in numpy_scores.items():
+            self.assertAlmostEqual(sql_scores[listing_id], score, places=6)
+
+    def test_engines_agree_on_a_stale_model(self):
+        from .models import FavoriteLocation
+        preferences = PreferenceModel.load()
+        # Not in `preferences`: both engines must ignore it
+        FavoriteLocation.objects.create(latitude=41.3, longitude=-71.1)
+
+        results = []
+        for engine in ('numpy', 'sql'):
+            FeatureRanker.get_scoring_engine(engine).recompute(preferences)
+            results.append({
+                listing_id: (score, distance)
+                for listing_id, score, distance in RankingScore.objects.values_list('listing_id', 'score', 'hotspot_distance')
+            })
+        numpy_results, sql_results = results
+        self.assertEqual(numpy_results.keys(), sql_results.keys())
+        self.assertIsNotNone(numpy_results[self.listings[1].id][1])
+        for listing_id, (score, distance) in numpy_results.items():
+            self.assertAlmostEqual(sql_results[listing_id][0], score, places=6)
+            if distance is None:
+                self.assertIsNone(sql_results[listing_id][1])
+            else:
+                self.assertAlmostEqual(sql_results[listing_id][1], distance, places=9)
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            FeatureRanker.recompute_all_scores(engine='fortran')
+
+@override_settings(RANKING_RESCORE_ASYNC=True)
+class RescoreQueueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.listing_a = MlsHistory.objects.create(formatted_address="1 Queue St", list_price=400000, beds=2)
+        self.listing_b = MlsHistory.objects.create(formatted_address="2 Queue St", list_price=500000, beds=3)
+
+    def vote(self, winner='A'):
+        return self.client.post('/api/comparisons/', {
+            'listing_a_id': self.listing_a.id,
+            'listing_b_id': self.listing_b.id,
+            'winner': winner
+        }, format='json')
+
+    def test_votes_coalesce_into_one_pending_job(self):
+        first = self.vote('A')
+        second = self.vote('B')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.data['pending_version'], second.data['pending_version'])
+        self.assertEqual(RescoreJob.objects.filter(status=RescoreJob.PENDING).count(), 1)
+        self.assertEqual(first.data['scores_version'], 0)
+
+    def test_recover_leaves_recently_claimed_jobs(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        self.vote('A')
+        job_id, = RescoreQueue.claim()
+        self.assertEqual(RescoreQueue.recover(), 0)
+
+        # Claimed long ago and never finished: its worker died
+        RescoreJob.objects.filter(id=job_id).update(
+            started_at=timezone.now() - timedelta(seconds=RescoreQueue.CLAIM_GRACE + 1)
+        )
+        self.assertEqual(RescoreQueue.recover(), 1)
+        self.assertEqual(RescoreJob.objects.get(id=job_id).status, RescoreJob.PENDING)
+
+    def test_worker_pass_publishes_scores_version(self):
+        pending = self.vote('A').data['pending_version']
+        version = RescoreQueue.process_pending()
+        self.assertEqual(version, pending)
+        self.assertEqual(RescoreQueue.scores_version(), pending)
+        self.assertIsNone(RescoreQueue.pending_version())
+        self.assertEqual(
+            RankingScore.objects.get(listing=self.listing_a).score,
+            FeatureRanker.get_score(self.listing_a)
+        )
+
+        status_response = self.client.get('/api/rankings/status/')
+        self.assertEqual(status_response.data['scores_version'], pending)
+
+    def test_empty_queue_is_a_no_op(self):
+        self.assertIsNone(RescoreQueue.process_pending())
+
+class DeltaScoringTests(TestCase):
+    def setUp(self):
+        self.listings = [
+            MlsHistory.objects.create(
+                formatted_address=f"{i} Delta Way",
+                list_price=400000 + i * 150000,
+                beds=2 + i % 3,
+                full_baths=1 + i % 2,
+                sqft=1200 + i * 300,
+                neighborhoods=["Northside", "Southside", None][i % 3],
+                latitude=40.0 + i * 0.05,
+                longitude=-70.0 - i * 0.03
+            )
+            for i in range(6)
+        ]
+
+    def queue_rescore(self):
+        RescoreQueue.enqueue()
+        return RescoreQueue.process_pending(incremental=True)
+
+    def assertScoresCurrent(self):
+        for listing in self.listings:
+            stored = RankingScore.objects.get(listing=listing).score
+            self.assertAlmostEqual(stored, FeatureRanker.get_score(listing), places=6)
+
+    def test_delta_after_votes_matches_full_scores(self):
+        self.queue_rescore()
+        FeatureRanker.update_weights(self.listings[0], self.listings[4], 'B')
+        FeatureRanker.update_weights(self.listings[1], self.listings[2], 'A')
+        self.queue_rescore()
+        self.assertScoresCurrent()
+
+    def test_new_listing_is_scored_in_full(self):
+        self.queue_rescore()
+        FeatureRanker.update_weights(self.listings[0], self.listings[3], 'A')
+        self.listings.append(MlsHistory.objects.create(
+            formatted_address="New Delta Way", list_price=999000, beds=5, latitude=40.2, longitude=-70.1
+        ))
+        self.queue_rescore()
+        self.assertScoresCurrent()
+
+    def test_removed_hotspot_requires_full_rescore(self):
+        from .models import FavoriteLocation
+        self.queue_rescore()
+        FeatureRanker.update_weights(self.listings[0], self.listings[1], 'A')
+        self.queue_rescore()
+        base = RescoreJob.objects.filter(status=RescoreJob.DONE).latest('id').snapshot
+        FavoriteLocation.objects.all().delete()
+        self.assertFalse(DeltaScorer.can_apply(base, PreferenceModel.load()))
+        self.queue_rescore()
+        self.assertScoresCurrent()
+
+class PreferenceModelTests(TestCase):
+    def setUp(self):
+        self.listing = MlsHistory.objects.create(
+            formatted_address="1 Cache Ct", list_price=800000, beds=3, neighborhoods="Northside",
+            latitude=40.0, longitude=-70.0
+        )
+        FeatureWeight.objects.create(feature_name='beds', weight=2.0)
+        NeighborhoodWeight.objects.create(neighborhood_name="Northside", weight=0.5)
+        LearnedPreference.objects.create(key='budget_cap', value=700000.0)
+
+    def test_scoring_with_model_costs_no_queries(self):
+        model = PreferenceModel.current()
+        with self.assertNumQueries(0):
+            FeatureRanker.get_score(self.listing, model)
+
+    def test_current_is_cached_until_a_write(self):
+        first = PreferenceModel.current()
+        with self.assertNumQueries(1):
+            self.assertIs(PreferenceModel.current(), first)
+
+        FeatureWeight.objects.filter(feature_name='beds').delete()
+        FeatureWeight.objects.create(feature_name='beds', weight=3.0)
+        self.assertEqual(PreferenceModel.current().weights['beds'], 3.0)
+
+    def test_update_weights_returns_persisted_model(self):
+        other = MlsHistory.objects.create(formatted_address="2 Cache Ct", list_price=500000, beds=2)
+        updated = FeatureRanker.update_weights(self.listing, other, 'A')
+        reloaded = PreferenceModel.load()
+        self.assertEqual(updated.weights['beds'], reloaded.weights['beds'])
+        self.assertEqual(updated.neighborhood_weights, reloaded.neighborhood_weights)
+        self.assertEqual(updated.budget_cap, reloaded.budget_cap)
+        self.assertEqual(len(updated.hotspots), len(reloaded.hotspots))
+
+class HotspotCompactionTests(TestCase):
+    def setUp(self):
+        from .models import FavoriteLocation
+        self.FavoriteLocation = FavoriteLocation
+        # Two tight groups of votes and one isolated hotspot
+        for lat, lon in [(40.0, -70.0), (40.0004, -70.0), (40.0008, -70.0), (41.0, -71.0), (41.0006, -71.0), (42.0, -72.0)]:
+            FavoriteLocation.objects.create(latitude=lat, longitude=lon)
+
+    def test_location_point_is_kept_in_sync(self):
+        spot = self.FavoriteLocation.objects.first()
+        self.assertEqual((spot.location.x, spot.location.y), (spot.longitude, spot.latitude))
+
+    def test_compaction_merges_into_weighted_centroids(self):
+        removed = HotspotCompactor.compact(limit=3)
+        self.assertEqual(removed, 3)
+        spots = sorted(self.FavoriteLocation.objects.all(), key=lambda s: s.latitude)
+        self.assertEqual([s.weight for s in spots], [3.0, 2.0, 1.0])
+        self.assertAlmostEqual(spots[0].latitude, 40.0004)
+        self.assertAlmostEqual(spots[1].latitude, 41.0003)
+        self.assertIsNotNone(spots[0].location)
+
+    def test_compaction_widens_radius_until_under_limit(self):
+        HotspotCompactor.compact(limit=1)
+        self.assertEqual(self.FavoriteLocation.objects.count(), 1)
+        self.assertEqual(self.FavoriteLocation.objects.get().weight, 6.0)
+
+    def test_non_positive_limit_merges_to_one(self):
+        HotspotCompactor.compact(limit=0)
+        self.assertEqual(self.FavoriteLocation.objects.count(), 1)
+
+    def test_no_compaction_below_limit(self):
+        self.assertEqual(HotspotCompactor.compact(limit=10), 0)
+        self.assertEqual(self.FavoriteLocation.objects.count(), 6)
+
+class PreferenceSolverTests(TestCase):
+    def setUp(self):
+        from .models import RankingComparison
+        self.listings = [
+            MlsHistory.objects.create(
+                formatted_address=f"{i} Refit Rd",
+                list_price=300000 + i * 50000,
+                beds=1 + i,
+                sqft=1000 + (i % 3) * 400,
+                neighborhoods=["Northside", "Southside"][i % 2],
+                latitude=40.0 + i * 0.01,
+                longitude=-70.0
+            )
+            for i in range(6)
+        ]
+        # Every vote prefers the listing with more bedrooms
+        for i in range(6):
+            for j in range(i + 1, 6):
+                RankingComparison.objects.create(listing_a=self.listings[j], listing_b=self.listings[i], winner='A')
+
+    def test_refit_learns_preferred_feature(self):
+        result = PreferenceSolver.refit()
+        self.assertEqual(result['comparisons'], 15)
+        self.assertGreater(FeatureWeight.objects.get(feature_name='beds').weight, 0)
+
+    def test_refit_replays_budget_cap_and_hotspots(self):
+        from .models import FavoriteLocation
+        PreferenceSolver.refit()
+        self.assertEqual(LearnedPreference.objects.get(key='budget_cap').value, 550000.0)
+        self.assertEqual(FavoriteLocation.objects.count(), 15)
+
+    def test_refit_is_reproducible(self):
+        first = PreferenceSolver.refit()
+        second = PreferenceSolver.refit()
+        self.assertEqual(first['weights'], second['weights'])
+        self.assertEqual(first['neighborhood_weights'], second['neighborhood_weights'])
+
+    def test_dry_run_writes_nothing(self):
+        PreferenceSolver.refit(dry_run=True)
+        self.assertFalse(FeatureWeight.objects.exists())
+
+    def test_refit_endpoint_queues_rescore(self):
+        response = APIClient().post('/api/rankings/refit/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RescoreJob.objects.get(status=RescoreJob.PENDING).id, response.data['pending_version'])
+
+    def test_refit_endpoint_rejects_invalid_l2(self):
+        for l2 in (0, -1, 'nan', 'inf'):
+            response = APIClient().post('/api/rankings/refit/', {'l2': l2}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(FeatureWeight.objects.exists())
+
+    def test_fit_rejects_non_finite_features(self):
+        import numpy as np
+        X = np.array([[1.0, np.nan], [0.5, 1.0]])
+        with self.assertRaises(ValueError):
+            PreferenceSolver.fit(X, np.array([1.0, 0.0]))
+
+class ComparisonBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.listings = [
+            MlsHistory.objects.create(
+                formatted_address=f"{i} Batch Blvd",
+                list_price=400000 + i * 100000,
+                beds=2 + i,
+                full_baths=1 + i % 2,
+                neighborhoods=["Northside", "Southside", "Northside"][i],
+                latitude=40.0 + i * 0.1,
+                longitude=-70.0
+            )
+            for i in range(3)
+        ]
+        self.votes = [
+            (self.listings[0], self.listings[1], 'A'),
+            (self.listings[1], self.listings[2], 'B'),
+            (self.listings[0], self.listings[2], 'TIE'),
+        ]
+
+    def test_batch_matches_sequential_votes(self):
+        from .models import RankingComparison, FavoriteLocation
+        sequential = PreferenceModel.current()
+        for a, b, winner in self.votes:
+            sequential = FeatureRanker.apply_vote(sequential, a, b, winner)
+
+        response = self.client.post('/api/comparisons/batch/', {'votes': [
+            {'listing_a_id': a.id, 'listing_b_id': b.id, 'winner': winner} for a, b, winner in self.votes
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 3)
+
+        saved = PreferenceModel.load()
+        self.assertEqual(saved.weights, sequential.weights)
+        self.assertEqual(saved.neighborhood_weights, sequential.neighborhood_weights)
+        self.assertEqual(saved.budget_cap, sequential.budget_cap)
+        self.assertEqual(RankingComparison.objects.count(), 3)
+        self.assertEqual(FavoriteLocation.objects.count(), 2)
+        self.assertEqual(RescoreJob.objects.filter(status=RescoreJob.PENDING).count(), 1)
+
+    def test_batch_rejects_unknown_listing(self):
+        response = self.client.post('/api/comparisons/batch/', {'votes': [
+            {'listing_a_id': self.listings[0].id, 'listing_b_id': 999999, 'winner': 'A'}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['missing'], [999999])
+        self.assertFalse(FeatureWeight.objects.exists())
+
+    def test_batch_rejects_oversized_batch(self):
+        from .models import RankingComparison
+        from .views import MAX_BATCH
+        vote = {'listing_a_id': self.listings[0].id, 'listing_b_id': self.listings[1].id, 'winner': 'A'}
+        response = self.client.post('/api/comparisons/batch/', {'votes': [vote] * (MAX_BATCH + 1)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RankingComparison.objects.exists())
+
+    def test_batch_rejects_invalid_winner(self):
+        response = self.client.post('/api/comparisons/batch/', {'votes': [
+            {'listing_a_id': self.listings[0].id, 'listing_b_id': self.listings[1].id, 'winner': 'C'}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PairSelectionTests(TestCase):
+    def setUp(self):
+        PairSelector.invalidate()
+        self.client = APIClient()
+
+    def make_listing(self, listing_id, score):
+        listing = MlsHistory.objects.create(formatted_address=f"{listing_id} Pair Pl", listing_id=listing_id)
+        RankingScore.objects.filter(listing=listing).update(score=score)
+        CurrentListing.refresh(concurrently=False)
+        return listing
+
+    def test_pairs_use_current_snapshot_only(self):
+        old = self.make_listing('L1', 1.0)
+        current = self.make_listing('L1', 2.0)
+        other = self.make_listing('L2', 3.0)
+
+        for _ in range(20):
+            pair = PairSelector.select()
+            self.assertCountEqual(pair, [current.id, other.id])
+        self.assertNotIn(old.id, PairSelector.current()['ids'].tolist())
+
+    def test_pairs_are_score_neighbours(self):
+        listings = [self.make_listing(f'N{i}', float(i)) for i in range(10)]
+        ids = [l.id for l in listings]
+        for _ in range(50):
+            a, b = PairSelector.select()
+            self.assertEqual(abs(ids.index(a) - ids.index(b)), 1)
+
+    def test_fresh_listing_paired_with_anchor(self):
+        from .models import RankingComparison
+        anchor = self.make_listing('A', 5.0)
+        partner = self.make_listing('P', 0.0)
+        for _ in range(PairSelector.ANCHOR_MIN_COMPARISONS):
+            RankingComparison.objects.create(listing_a=anchor, listing_b=partner, winner='A')
+        fresh = self.make_listing('F', 4.0)
+
+        index = PairSelector.current()
+        i = index['ids'].tolist().index(fresh.id)
+        self.assertEqual(index['ids'][PairSelector._anchor_for(index, i)], anchor.id)
+
+    def test_index_rebuilds_on_new_listing(self):
+        self.make_listing('R1', 1.0)
+        self.make_listing('R2', 2.0)
+        self.assertEqual(len(PairSelector.current()['ids']), 2)
+        self.make_listing('R3', 3.0)
+        self.assertEqual(len(PairSelector.current()['ids']), 3)
+
+    def test_rescore_rereads_scores_and_votes_only(self):
+        from .models import RankingComparison
+        low, mid, high = self.make_listing('S1', 1.0), self.make_listing('S2', 2.0), self.make_listing('S3', 3.0)
+        PairSelector.current()
+        RankingScore.objects.filter(listing=low).update(score=10.0)
+        RankingComparison.objects.create(listing_a=mid, listing_b=high, winner='A')
+        RescoreJob.objects.create(status=RescoreJob.DONE)
+
+        # Versions, scores and new votes; the listing set is not reloaded
+        with self.assertNumQueries(4):
+            index = PairSelector.current()
+        self.assertEqual(index['ids'].tolist(), [mid.id, high.id, low.id])
+        self.assertEqual(index['fresh'].tolist(), [2])
+
+    def test_pair_endpoint_skips_deleted_listings(self):
+        kept = [self.make_listing('D1', 1.0).id, self.make_listing('D2', 2.0).id]
+        deleted = self.make_listing('D3', 1.5)
+        PairSelector.current()
+        deleted.delete()
+
+        for _ in range(10):
+            response = self.client.get('/api/comparisons/pair/')
+            self.assertEqual(response.status_code, 200)
+            self.assertCountEqual([response.data['a']['id'], response.data['b']['id']], kept)
+
+    def test_pair_endpoint(self):
+        self.make_listing('E1', 1.0)
+        response = self.client.get('/api/comparisons/pair/')
+        self.assertEqual(response.status_code, 400)
+
+        self.make_listing('E2', 2.0)
+        response = self.client.get('/api/comparisons/pair/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['a']['id'], response.data['b']['id'])
+
+
+class ScoreHistogramTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.listings = []
+        for i, score in enumerate([0.0, 1.0, 2.5, 9.0, 10.0]):
+            listing = MlsHistory.objects.create(
+                formatted_address=f"{i} Histogram Way", city="Alpha" if i < 3 else "Beta"
+            )
+            RankingScore.objects.filter(listing=listing).update(score=score)
+            self.listings.append(listing)
+
+    def test_matches_python_binning(self):
+        result = ScoreHistogram.compute(MlsHistory.objects.all(), bins=4)
+        self.assertEqual(result['bins'], [0.0, 2.5, 5.0, 7.5, 10.0])
+        self.assertEqual(result['counts'], [2, 1, 0, 2])
+
+    def test_single_value_and_empty(self):
+        result = ScoreHistogram.compute(MlsHistory.objects.filter(id=self.listings[0].id))
+        self.assertEqual(result, {"bins": [0.0, 1.0], "counts": [1]})
+        self.assertEqual(ScoreHistogram.compute(MlsHistory.objects.none()), {"bins": [], "counts": []})
+
+    def test_filtered_by_queryset(self):
+        result = ScoreHistogram.compute(MlsHistory.objects.filter(city="Beta"), bins=2)
+        self.assertEqual(result['counts'], [1, 1])
+
+    def test_cache_key_follows_versions(self):
+        from django.http import QueryDict
+        params = QueryDict('city=Alpha&bins=5')
+        key = ScoreHistogram.cache_key(params, 5)
+        self.assertEqual(key, ScoreHistogram.cache_key(QueryDict('bins=5&city=Alpha'), 5))
+        MlsHistory.objects.create(formatted_address="New Listing")
+        self.assertNotEqual(key, ScoreHistogram.cache_key(params, 5))
+
+    def test_reset_invalidates_cached_histogram(self):
+        from django.http import QueryDict
+        params = QueryDict('')
+        before = ScoreHistogram.cached(MlsHistory.objects.all(), params, 4)
+
+        response = self.client.post('/api/rankings/reset/')
+        self.assertEqual(response.status_code, 200)
+        after = ScoreHistogram.cached(MlsHistory.objects.all(), params, 4)
+        self.assertNotEqual(after, before)
+        self.assertEqual(after, ScoreHistogram.compute(MlsHistory.objects.all(), 4))
+
+    def test_endpoint_rejects_bad_bins(self):
+        response = self.client.get('/api/rankings/distribution/?bins=0')
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoint_rejects_bad_filters(self):
+        response = self.client.get('/api/rankings/distribution/?price_min=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price_min', response.data)
+
+
+class ListingQueryCountTests(TestCase):
+    """
+    The ranking score is annotated on the listing queries; serializing must not add a query per row.
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.listings = [
+            MlsHistory.objects.create(
+                formatted_address=f"{i} Query Ct", list_price=100000 + i, latitude=40.0, longitude=-70.0
+            )
+            for i in range(10)
+        ]
+        RankingScore.objects.filter(listing=self.listings[0]).update(score=42.0)
+        RankingScore.objects.filter(listing=self.listings[1]).delete()
+
+    def test_serializer_uses_annotation(self):
+        from listings.serializers import ListingSerializer, with_ranking_score
+        with self.assertNumQueries(1):
+            data = ListingSerializer(with_ranking_score(MlsHistory.objects.order_by('id')), many=True).data
+        self.assertEqual(data[0]['ranking_score'], 42.0)
+        self.assertEqual(data[1]['ranking_score'], 1000.0)
+
+    def test_subset_pair_query_count(self):
+        ids = [l.id for l in self.listings]
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/comparisons/subset-pair/', {'candidate_ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_candidates_query_count(self):
+        from listings.models import CurrentListing
+        from listings.similarity import ListingSimilarity
+        CurrentListing.refresh(concurrently=False)
+        ListingSimilarity.invalidate()
+        ListingSimilarity.current()
+        # Seed, ingest generation (the similarity index is already built), candidates
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/candidates/', {'seed_id': self.listings[0].id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 9)
+
+    def list_listings(self, params):
+        from listings.models import CurrentListing
+        from listings.result_cache import ListingResultCache
+        CurrentListing.refresh(concurrently=False)
+        ListingResultCache.cache().clear()
+        # Data versions (shared by the ETag and the result cache key), then the page
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/listings/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_listing_list_query_count(self):
+        rows = self.list_listings({})
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[0]['ranking_score'], 42.0)
+
+    def test_listing_list_sparse_fields_query_count(self):
+        rows = self.list_listings({'fields': 'id,list_price,ranking_score'})
+        self.assertEqual(set(rows[0]), {'id', 'list_price', 'ranking_score'})
+
+    def test_listing_detail_query_count(self):
+        from listings.models import CurrentListing
+        CurrentListing.refresh(concurrently=False)
+        # Data versions, then the listing with its score
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/listings/{self.listings[0].id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ranking_score'], 42.0)
+
+    def test_random_listing_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/comparisons/random/')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,105 @@
+import hashlib
+from functools import wraps
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from .models import RescoreJob, VersionCounter
+
+
+class DataVersions:
+    """
+    Generations of the data behind API responses:
+
+    - 'ingest': bumped after every scraper run (CurrentListing.refresh)
+    - 'scores': scores_version, the latest completed rescore
+    - 'preferences': bumped on every weight or preference write
+
+    Reading them costs at most two small indexed queries, so responses
+    can be validated without running the query they describe.
+    """
+    INGEST_KEY = 'ingest'
+    PREFERENCES_KEY = 'preferences'
+    SCOPES = ('ingest', 'scores', 'preferences')
+
+    @classmethod
+    def bump_ingest(cls):
+        return VersionCounter.bump(cls.INGEST_KEY)
+
+    @classmethod
+    def for_request(cls, request, scopes):
+        """
+        current(scopes), read once per request however many layers ask for it.
+        """
+        memo = request.__dict__.setdefault('_data_versions', {})
+        scopes = tuple(scopes)
+        if scopes not in memo:
+            memo[scopes] = cls.current(scopes)
+        return memo[scopes]
+
+    @classmethod
+    def current(cls, scopes):
+        """
+        Returns {scope: (version, last change time or None)} for the given scopes.
+        """
+        versions = {}
+        keys = {'ingest': cls.INGEST_KEY, 'preferences': cls.PREFERENCES_KEY}
+        counter_keys = [keys[scope] for scope in scopes if scope in keys]
+        if counter_keys:
+            counters = {
+                key: (value, updated_at)
+                for key, value, updated_at in VersionCounter.objects.filter(key__in=counter_keys)
+                .values_list('key', 'value', 'updated_at')
+            }
+            for scope in scopes:
+                if scope in keys:
+                    versions[scope] = counters.get(keys[scope], (0, None))
+        if 'scores' in scopes:
+            job = (
+                RescoreJob.objects.filter(status=RescoreJob.DONE).order_by('-id')
+                .values_list('id', 'finished_at').first()
+            )
+            versions['scores'] = job or (0, None)
+        return versions
+
+
+def conditional_get(*scopes):
+    """
+    View decorator adding ETag/Last-Modified validators derived from the
+    DataVersions `scopes`, the request path and query string and the negotiated
+    format (responses carry Vary: Accept). A matching If-None-Match/
+    If-Modified-Since is answered with 304 before the view runs.
+    """
+    unknown = set(scopes) - set(DataVersions.SCOPES)
+    if unknown:
+        raise ValueError(f"Unknown data version scopes: {', '.join(sorted(unknown))}")
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            versions = DataVersions.for_request(request, scopes)
+            params = sorted((key, sorted(request.GET.getlist(key))) for key in request.GET)
+            # The Accept header can select another renderer for the same URL
+            renderer_format = getattr(getattr(request, 'accepted_renderer', None), 'format', None)
+            digest = hashlib.sha1(
+                repr((request.path, params, renderer_format, sorted((s, v[0]) for s, v in versions.items()))).encode()
+            ).hexdigest()
+            etag = quote_etag(digest)
+            changed = [v[1] for v in versions.values() if v[1] is not None]
+            last_modified = int(max(changed).timestamp()) if changed else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+                # Let browsers keep the response but revalidate it on every use
+                if not response.has_header('Cache-Control'):
+                    patch_cache_control(response, no_cache=True)
+                patch_vary_headers(response, ['Accept'])
+            return response
+        return wrapped
+    return decorator
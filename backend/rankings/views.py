@@ -3,23 +3,45 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from .models import RankingScore, RankingComparison, FeatureWeight, NeighborhoodWeight, LearnedPreference
 from listings.models import MlsHistory
-from listings.serializers import ListingSerializer
+from listings.serializers import ListingSerializer, with_ranking_score
+from listings.filters import filter_listings
+from listings.similarity import ListingSimilarity
 from .feature_ranker import FeatureRanker
+from .rescore_queue import RescoreQueue
+from .refit import PreferenceSolver
+from .pair_selection import PairSelector
+from .score_histogram import ScoreHistogram
+from .versions import conditional_get
+from .preference_model import PreferenceModel
+from django.conf import settings
 from django.db import transaction
+import math
 import random
 
+# Candidates are drawn from within a mile of the seed
+CANDIDATE_RADIUS_M = 1609.344
+# Votes accepted by one /api/comparisons/batch/ request (applied in a single transaction)
+MAX_BATCH = 500
+
 @api_view(['GET'])
 def get_comparison_pair(request):
     """
     GET /api/comparisons/pair/
+    Picks an informative pair: close scores, few prior votes (see PairSelector).
     """
-    listings = list(MlsHistory.objects.all()[:100])
-    if len(listings) < 2:
-        return Response({"error": "Not enough listings"}, status=status.HTTP_400_BAD_VALUE)
-    
-    pair = random.sample(listings, 2)
-    serializer = ListingSerializer(pair, many=True)
-    
+    # The index follows the current_listings view, which can still hold snapshots
+    # deleted since the last ingest; drop those and draw again
+    while True:
+        pair_ids = PairSelector.select()
+        if pair_ids is None:
+            return Response({"error": "Not enough listings"}, status=status.HTTP_400_BAD_REQUEST)
+        listings = with_ranking_score(MlsHistory.objects.all()).in_bulk(pair_ids)
+        missing = set(pair_ids) - set(listings)
+        if not missing:
+            break
+        PairSelector.discard(missing)
+    serializer = ListingSerializer([listings[i] for i in pair_ids], many=True)
+
     return Response({
         "a": serializer.data[0],
         "b": serializer.data[1]
@@ -51,46 +73,97 @@ def submit_comparison(request):
             winner=winner
         )
 
-        # Update weights and recompute scores
+        # Update weights; the full rescore is queued for the background worker
         FeatureRanker.update_weights(listing_a, listing_b, winner)
-        FeatureRanker.recompute_all_scores()
+        job = RescoreQueue.enqueue()
+
+    if not getattr(settings, 'RANKING_RESCORE_ASYNC', True):
+        RescoreQueue.process_pending()
+
+    # Scores are fresh once scores_version >= pending_version
+    return Response({
+        "status": "success",
+        "scores_version": RescoreQueue.scores_version(),
+        "pending_version": job.id
+    }, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+def submit_comparison_batch(request):
+    """
+    POST /api/comparisons/batch/
+    Submit an ordered list of votes: {"votes": [{"listing_a_id", "listing_b_id", "winner"}, ...]}.
+    Votes are applied in order, weights are written once and a single rescore is queued.
+    """
+    votes = request.data.get('votes') if isinstance(request.data, dict) else request.data
+    if not isinstance(votes, list) or not votes:
+        return Response({"error": "votes must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(votes) > MAX_BATCH:
+        return Response({"error": f"At most {MAX_BATCH} votes per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        parsed = [(int(v['listing_a_id']), int(v['listing_b_id']), v['winner']) for v in votes]
+    except (KeyError, TypeError, ValueError):
+        return Response({"error": "Each vote needs listing_a_id, listing_b_id and winner"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if any(winner not in ['A', 'B', 'TIE', 'NEITHER'] for _, _, winner in parsed):
+        return Response({"error": "Invalid winner choice"}, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response({"status": "success"}, status=status.HTTP_201_CREATED)
+    listings = MlsHistory.objects.in_bulk({a for a, _, _ in parsed} | {b for _, b, _ in parsed})
+    missing = sorted({i for a, b, _ in parsed for i in (a, b)} - set(listings))
+    if missing:
+        return Response({"error": "Listing not found", "missing": missing}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        RankingComparison.objects.bulk_create([
+            RankingComparison(listing_a=listings[a], listing_b=listings[b], winner=winner)
+            for a, b, winner in parsed
+        ])
+
+        start = model = PreferenceModel.current()
+        for a, b, winner in parsed:
+            model = FeatureRanker.apply_vote(model, listings[a], listings[b], winner)
+        FeatureRanker.save_model(start, model)
+        job = RescoreQueue.enqueue()
+
+    if not getattr(settings, 'RANKING_RESCORE_ASYNC', True):
+        RescoreQueue.process_pending()
+
+    return Response({
+        "status": "success",
+        "count": len(parsed),
+        "scores_version": RescoreQueue.scores_version(),
+        "pending_version": job.id
+    }, status=status.HTTP_201_CREATED)
 
 @api_view(['GET'])
-def get_ranking_distribution(request):
+def get_rescore_status(request):
     """
-    GET /api/rankings/distribution/
+    GET /api/rankings/status/
+    Reports the current scores_version and any queued rescore.
     """
-    scores = list(RankingScore.objects.values_list('score', flat=True))
-    if not scores:
-        return Response({"bins": [], "counts": []})
-    
-    min_score = min(scores)
-    max_score = max(scores)
-    
-    if min_score == max_score:
-        return Response({
-            "bins": [min_score, max_score + 1],
-            "counts": [len(scores)]
-        })
-    
-    num_bins = 10
-    bin_size = (max_score - min_score) / num_bins
-    bins = [min_score + i * bin_size for i in range(num_bins + 1)]
-    counts = [0] * num_bins
-    
-    for s in scores:
-        for i in range(num_bins):
-            if s >= bins[i] and (s < bins[i+1] or (i == num_bins - 1 and s <= bins[i+1])):
-                counts[i] += 1
-                break
-                
     return Response({
-        "bins": bins,
-        "counts": counts
+        "scores_version": RescoreQueue.scores_version(),
+        "pending_version": RescoreQueue.pending_version()
     })
 
+@api_view(['GET'])
+@conditional_get('ingest', 'scores')
+def get_ranking_distribution(request):
+    """
+    GET /api/rankings/distribution/
+    Histogram of ranking scores over the listings matching the /api/listings/ filters.
+    Optional ?bins= sets the number of bins.
+    """
+    try:
+        bins = int(request.query_params.get('bins', ScoreHistogram.DEFAULT_BINS))
+    except ValueError:
+        return Response({"error": "bins must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= bins <= ScoreHistogram.MAX_BINS:
+        return Response({"error": f"bins must be between 1 and {ScoreHistogram.MAX_BINS}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    listings = filter_listings(request.query_params)
+    return Response(ScoreHistogram.cached(listings, request.query_params, bins))
+
 @api_view(['GET'])
 def get_random_listing(request):
     """
@@ -100,7 +173,7 @@ def get_random_listing(request):
     exclude_ids = request.query_params.getlist('exclude') + request.query_params.getlist('exclude[]')
     subset_ids = request.query_params.getlist('subset_ids') + request.query_params.getlist('subset_ids[]')
 
-    queryset = MlsHistory.objects.exclude(id__in=exclude_ids)
+    queryset = with_ranking_score(MlsHistory.objects.exclude(id__in=exclude_ids))
     
     if subset_ids:
         queryset = queryset.filter(id__in=subset_ids)
@@ -117,6 +190,7 @@ def get_random_listing(request):
     return Response(serializer.data)
 
 @api_view(['GET'])
+@conditional_get('preferences')
 def get_feature_insights(request):
     """
     GET /api/rankings/insights/
@@ -136,7 +210,8 @@ def get_feature_insights(request):
 def get_candidates(request):
     """
     POST /api/candidates/
-    Identify candidates based on a seed listing.
+    Identify candidates based on a seed listing: the listings most like it (see ListingSimilarity).
+    Optional k, radius_m, price_min and price_max override the defaults.
     """
     seed_id = request.data.get('seed_id')
     if not seed_id:
@@ -147,36 +222,24 @@ def get_candidates(request):
     except MlsHistory.DoesNotExist:
         return Response({"error": "Seed listing not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Phase 1 Logic:
-    # 1. Location: Within 1 mile (approx 1609 meters)
-    # 2. Price: <= Seed Price * 2
-    
-    # We use DWithin for spatial query if available, else basic lat/lon box?
-    # The user has PointField, so we can use GIS lookups.
-    # Note: Using MlsHistory which inherits ListingBase with PointField.
-    
-    candidates = MlsHistory.objects.exclude(id=seed.id)
-    
-    if seed.location:
-        from django.contrib.gis.measure import D
-        candidates = candidates.filter(location__distance_lte=(seed.location, D(mi=1)))
-    elif seed.latitude and seed.longitude:
-        # Fallback if location field is empty but lat/lon exists (though ListingBase usually syncs them)
-        # Simple bounding box approximation for 1 mile ~ 1/69 degrees lat
-        lat_delta = 1.0 / 69.0
-        lon_delta = 1.0 / 50.0 # roughly at typical US latitudes
-        candidates = candidates.filter(
-            latitude__range=(seed.latitude - lat_delta, seed.latitude + lat_delta),
-            longitude__range=(seed.longitude - lon_delta, seed.longitude + lon_delta)
+    # Phase 1 limits (within a mile, up to twice the seed's price) unless the request
+    # overrides them; inside them the most similar listings come first
+    try:
+        options = ListingSimilarity.query_options(
+            request.data, radius_m=CANDIDATE_RADIUS_M,
+            price_max=float(seed.list_price) * 2 if seed.list_price else None
         )
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    matches = ListingSimilarity.similar(seed, **options)
+    listings = with_ranking_score(MlsHistory.objects.all()).in_bulk([i for i, _ in matches])
+    candidates = []
+    for snapshot_id, distance in matches:
+        if snapshot_id in listings:
+            listings[snapshot_id].similarity_distance = distance
+            candidates.append(listings[snapshot_id])
 
-    if seed.list_price:
-        max_price = seed.list_price * 2
-        candidates = candidates.filter(list_price__lte=max_price)
-        
-    # Limit for sanity?
-    candidates = candidates[:50]
-    
     serializer = ListingSerializer(candidates, many=True)
     return Response(serializer.data)
 
@@ -198,7 +261,7 @@ def get_subset_comparison_pair(request):
          
     # Pick 2 random
     pair_ids = random.sample(valid_ids, 2)
-    pair = MlsHistory.objects.filter(id__in=pair_ids)
+    pair = with_ranking_score(MlsHistory.objects.filter(id__in=pair_ids))
     
     # Ensure order matches random sample to keep randomness
     # iterating querysets doesn't guarantee order, so we map back
@@ -224,5 +287,39 @@ def reset_rankings(request):
         FeatureWeight.objects.all().delete()
         NeighborhoodWeight.objects.all().delete()
         LearnedPreference.objects.all().delete()
-        
-    return Response({"status": "success", "message": "All ranking data reset."})
+        # Rescore under the cleared preferences before committing: the completed job moves
+        # scores_version, so cached histograms and ETags never outlive the deleted scores
+        job = RescoreQueue.enqueue()
+        RescoreQueue.rescore([job.id], incremental=False)
+
+    return Response({"status": "success", "message": "All ranking data reset.", "scores_version": job.id})
+
+@api_view(['POST'])
+def refit_preferences(request):
+    """
+    POST /api/rankings/refit/
+    Rebuild all weights from the comparison log and queue a rescore.
+    """
+    try:
+        l2 = float(request.data['l2']) if request.data.get('l2') is not None else None
+    except (TypeError, ValueError):
+        return Response({"error": "l2 must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    if l2 is not None and not (math.isfinite(l2) and l2 > 0):
+        return Response({"error": "l2 must be a positive number"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        result = PreferenceSolver.refit(l2=l2, dry_run=bool(request.data.get('dry_run')))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if result is None:
+        return Response({"error": "No comparisons to fit"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        "comparisons": result['comparisons'],
+        "iterations": result['iterations'],
+        "weights": result['weights'],
+        "neighborhood_weights": result['neighborhood_weights'],
+        "budget_cap": result['budget_cap'],
+        "hotspots": len(result['hotspots']),
+        "pending_version": result.get('pending_version')
+    })
@@ -138,16 +138,15 @@ function App() {
         const resListings = await axios.get('/api/listings/', { params });
         setListings(resListings.data.results);
 
-        // Fetch Heatmap Data (All items, simplified)
+        // Fetch Heatmap Data (mean price per grid cell, binned server-side)
         // We also apply filters to heatmap for consistency
-        const resMetrics = await axios.get('/api/listings/metrics/', { params });
-        const data = resMetrics.data
-          .filter(l => l.latitude && l.longitude)
-          .map(l => ({
-            latitude: l.latitude,
-            longitude: l.longitude,
-            intensity: l.list_price ? Number(l.list_price) / 1000000 : 0.5
-          }));
+        const resMetrics = await axios.get('/api/listings/metrics/', { params: { ...params, metric: 'price' } });
+        const { longitude, latitude, value } = resMetrics.data.columns;
+        const data = longitude.map((lon, i) => ({
+          latitude: latitude[i],
+          longitude: lon,
+          intensity: value[i] ? value[i] / 1000000 : 0.5
+        }));
         setHeatmapData(data);
 
         setLoading(false);
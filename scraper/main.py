@@ -4,7 +4,7 @@ import logging
 from datetime import datetime
 from homeharvest import scrape_property
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from geoalchemy2 import Geometry, WKTElement
 
 # Configure Logging
@@ -147,6 +147,24 @@ def run_scraper(location):
     except Exception as e:
         logger.error(f"Error during scrape execution: {e}", exc_info=True)
 
+def refresh_current_listings():
+    """
+    Rebuilds the current_listings materialized view (latest snapshot per listing)
+    that the map API reads from. CONCURRENTLY keeps it readable during the refresh.
+    Also bumps the 'ingest' generation the API derives its ETags from.
+    """
+    logger.info("Refreshing current_listings...")
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY current_listings"))
+            connection.execute(text("""
+                INSERT INTO rankings_versioncounter (key, value, updated_at) VALUES ('ingest', 1, now())
+                ON CONFLICT (key) DO UPDATE SET value = rankings_versioncounter.value + 1, updated_at = now()
+            """))
+        logger.info("current_listings refreshed.")
+    except Exception as e:
+        logger.error(f"Failed to refresh current_listings: {e}", exc_info=True)
+
 def run_scraper_for_locations(locations):
     """
     Run the scraper for multiple locations.
@@ -170,6 +188,9 @@ def run_scraper_for_locations(locations):
     
     logger.info(f"Scraping complete. Successful: {successful}, Failed: {failed}")
 
+    if successful:
+        refresh_current_listings()
+
 if __name__ == "__main__":
     locations = []
     